@@ -0,0 +1,48 @@
+import pandas as pd
+
+from data.datahub import DataHub
+
+
+def _schedule(rows):
+    return pd.DataFrame(rows, columns=["date", "home_team", "away_team", "xg"])
+
+
+def test_reconciliation_reports_both_directions():
+    hub = DataHub("ENG-Premier League", "2324")
+
+    schedules = {
+        "understat": _schedule([
+            ("2024-01-01", "Arsenal", "Chelsea", 1.0),
+            ("2024-01-02", "Everton", "Fulham", 1.1),
+        ]),
+        # FBref: un partido con un día de diferencia y otro que Understat no tiene
+        "fbref": _schedule([
+            ("2024-01-02", "Arsenal", "Chelsea", 1.2),
+            ("2024-01-05", "Brentford", "Burnley", 0.9),
+        ]),
+        "sofascore": None,
+    }
+
+    table = hub._build_match_table(schedules)
+
+    assert len(table) == 3
+
+    unmatched = hub.unmatched_matches["fbref"]
+    assert list(zip(unmatched["home_team"], unmatched["away_team"])) == [("Brentford", "Burnley")]
+
+    missing = hub.missing_matches["fbref"]
+    assert list(zip(missing["home_team"], missing["away_team"])) == [("Everton", "Fulham")]
+    assert missing["date"].iloc[0] == pd.Timestamp("2024-01-02")
+
+    everton = table[table["home_team"] == "Everton"].iloc[0]
+    assert pd.isna(everton["fbref_xg"])
+
+
+def test_fully_matched_sources_report_nothing():
+    hub = DataHub("ENG-Premier League", "2324")
+    rows = [("2024-01-01", "Arsenal", "Chelsea", 1.0)]
+
+    hub._build_match_table({"understat": _schedule(rows), "fbref": _schedule(rows)})
+
+    assert hub.unmatched_matches["fbref"].empty
+    assert hub.missing_matches["fbref"].empty
@@ -0,0 +1,37 @@
+import os
+
+from processing.pipeline import Pipeline
+
+
+def test_stale_outputs_are_evicted(tmp_path):
+    source = {"value": 0}
+
+    pipeline = Pipeline(str(tmp_path), keep=2)
+    pipeline.add("data", lambda: source["value"], volatile=True)
+    pipeline.add("double", lambda value: value * 2, ["data"])
+
+    for value in range(5):
+        source["value"] = value
+        assert pipeline.run(refresh=True)["double"] == value * 2
+
+    stages = [entry["stage"] for entry in pipeline._manifest.values()]
+    assert stages.count("data") == 2
+    assert stages.count("double") == 2
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".pkl")]) == 2
+
+
+def test_reused_output_is_kept(tmp_path):
+    source = {"value": 0}
+
+    pipeline = Pipeline(str(tmp_path), keep=2)
+    pipeline.add("data", lambda: source["value"], volatile=True)
+    pipeline.add("double", lambda value: value * 2, ["data"])
+
+    # 0 se reutiliza entre medias, así que no es la más antigua al llegar 2
+    for value in (0, 1, 0, 2):
+        source["value"] = value
+        pipeline.run(refresh=True)
+
+    source["value"] = 0
+    pipeline.run(refresh=True)
+    assert pipeline.executed == ["data"]
@@ -0,0 +1,190 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from scrapers.request_scheduler import FBREF_HOST, PRIORITY_BULK, PRIORITY_INTERACTIVE, RequestScheduler
+
+
+class _StandIn(BaseHTTPRequestHandler):
+    """Servidor local: /flaky responde 429 las dos primeras veces, /ok siempre 200"""
+
+    protocol_version = "HTTP/1.1"
+    hits = {}
+    client_ports = set()
+
+    def do_GET(self):
+        _StandIn.hits[self.path] = _StandIn.hits.get(self.path, 0) + 1
+        _StandIn.client_ports.add(self.client_address[1])
+
+        status = 429 if self.path == "/flaky" and _StandIn.hits[self.path] <= 2 else 200
+        body = b"ok"
+
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _StandIn.hits = {}
+    _StandIn.client_ports = set()
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _StandIn)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"127.0.0.1:{httpd.server_address[1]}"
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def scheduler_factory():
+    schedulers = []
+
+    def build(**kwargs):
+        kwargs.setdefault("backoff_base", 0.01)
+        scheduler = RequestScheduler(**kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield build
+
+    for scheduler in schedulers:
+        scheduler.shutdown()
+
+
+def test_get_retries_429_with_backoff(server, scheduler_factory):
+    scheduler = scheduler_factory(host_rates={server: (100.0, 10)})
+
+    response = scheduler.get(f"http://{server}/flaky")
+
+    assert response.status_code == 200
+    assert _StandIn.hits["/flaky"] == 3
+
+
+def test_get_reuses_connections(server, scheduler_factory):
+    scheduler = scheduler_factory(host_rates={server: (100.0, 10)}, n_workers=1)
+
+    for _ in range(5):
+        scheduler.get(f"http://{server}/ok")
+
+    assert _StandIn.hits["/ok"] == 5
+    assert len(_StandIn.client_ports) == 1
+
+
+def test_token_bucket_limits_rate(server, scheduler_factory):
+    scheduler = scheduler_factory(host_rates={server: (20.0, 1)})
+
+    start = time.monotonic()
+    futures = [scheduler.submit(server, lambda: None) for _ in range(6)]
+    for future in futures:
+        future.result()
+
+    # 1 token de ráfaga + 5 a 20/s
+    assert time.monotonic() - start >= 0.2
+
+
+def test_programming_errors_are_not_retried(scheduler_factory):
+    scheduler = scheduler_factory()
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise KeyError("column")
+
+    with pytest.raises(KeyError):
+        scheduler.call("example.org", broken)
+
+    assert len(calls) == 1
+
+
+def test_network_errors_are_retried(scheduler_factory):
+    scheduler = scheduler_factory(max_retries=2)
+    calls = []
+
+    def unreachable():
+        calls.append(1)
+        raise requests.ConnectionError("refused")
+
+    with pytest.raises(requests.ConnectionError):
+        scheduler.call("example.org", unreachable)
+
+    assert len(calls) == 3
+
+
+def test_interactive_goes_before_bulk(scheduler_factory):
+    scheduler = scheduler_factory(n_workers=1, host_rates={"slow": (1000.0, 1000)})
+    order = []
+    gate = threading.Event()
+
+    # Ocupa el único worker mientras se llenan las colas
+    blocker = scheduler.submit("slow", gate.wait)
+    time.sleep(0.05)
+
+    bulk = [scheduler.submit("slow", order.append, "bulk", priority=PRIORITY_BULK) for _ in range(3)]
+    interactive = scheduler.submit("slow", order.append, "interactive", priority=PRIORITY_INTERACTIVE)
+
+    gate.set()
+    for future in [blocker, interactive] + bulk:
+        future.result()
+
+    assert order[0] == "interactive"
+
+
+def test_slow_host_does_not_hold_workers(server, scheduler_factory):
+    # Host lento: 1 token y después 1 cada 2 s
+    scheduler = scheduler_factory(n_workers=2, host_rates={"slow": (0.5, 1), server: (100.0, 10)})
+
+    bulk = [scheduler.submit("slow", lambda: None, priority=PRIORITY_BULK) for _ in range(4)]
+    time.sleep(0.05)
+
+    start = time.monotonic()
+    scheduler.get(f"http://{server}/ok", priority=PRIORITY_INTERACTIVE)
+    assert time.monotonic() - start < 0.5
+
+    for future in bulk[1:]:
+        future.cancel()
+
+
+def test_fbref_calls_never_overlap(scheduler_factory):
+    # Ráfaga y workers de sobra: solo el límite de concurrencia las separa
+    scheduler = scheduler_factory(n_workers=4, host_rates={FBREF_HOST: (1000.0, 10)})
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def read_stats():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+
+    futures = [scheduler.submit(FBREF_HOST, read_stats) for _ in range(4)]
+    for future in futures:
+        future.result()
+
+    assert max(peak) == 1
+
+
+def test_concurrency_cap_is_per_host(scheduler_factory):
+    scheduler = scheduler_factory(n_workers=2, host_rates={FBREF_HOST: (1000.0, 10)})
+    gate = threading.Event()
+
+    # La llamada a FBref en curso no bloquea a otros hosts
+    blocker = scheduler.submit(FBREF_HOST, gate.wait)
+    other = scheduler.submit("example.org", lambda: "done")
+
+    assert other.result(timeout=2) == "done"
+    gate.set()
+    blocker.result()
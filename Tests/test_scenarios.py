@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from ml.scenarios import evaluate_scenarios
+
+
+def _team_stats():
+    return pd.DataFrame({
+        "team": ["Arsenal", "Chelsea"],
+        "home_attack_strength": [1.2, 1.0],
+        "home_defense_strength": [0.9, 1.0],
+        "away_attack_strength": [1.1, 0.9],
+        "away_defense_strength": [0.8, 1.1],
+        "cluster": [0, 2],
+    })
+
+
+def test_matchup_scenario_on_cluster_without_factor():
+    # El cluster 2 no aparece en matchup_matrix: su factor base es 1
+    matches = pd.DataFrame({"home_team": ["Arsenal"], "away_team": ["Chelsea"]})
+    scenarios = [
+        {"name": "baseline"},
+        {"name": "boost", "matchup": {(0, 2): 1.5}},
+        {"name": "unused", "matchup": {(3, 4): 2.0}},
+    ]
+
+    result = evaluate_scenarios(
+        matches, _team_stats(), 1.5, 1.2, scenarios, matchup_matrix={0: {0: 1.1}}
+    ).set_index("scenario")
+
+    baseline = 1.2 * 1.1 * 1.5
+    assert np.isclose(result.loc["baseline", "home_lambda"], baseline)
+    assert np.isclose(result.loc["boost", "home_lambda"], baseline * 1.5)
+    assert np.isclose(result.loc["unused", "home_lambda"], baseline)
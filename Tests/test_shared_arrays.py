@@ -0,0 +1,84 @@
+import gc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.shared_arrays import SharedMatchArrays
+
+
+def _matches(n=50):
+    rng = np.random.default_rng(0)
+    teams = [f"team_{i}" for i in range(10)]
+    return pd.DataFrame({
+        "date": pd.date_range("2024-01-01", periods=n, freq="D"),
+        "home_team": rng.choice(teams, n),
+        "away_team": rng.choice(teams, n),
+        "home_xg": rng.gamma(2.0, 0.7, n),
+        "away_xg": rng.gamma(2.0, 0.6, n),
+    })
+
+
+def _column_sum(spec, name):
+    return float(SharedMatchArrays.attach(spec)[name].sum())
+
+
+def _detached_column_sum(spec, name):
+    # La columna sobrevive al MatchArrays que la creó
+    column = SharedMatchArrays.attach(spec)[name]
+    gc.collect()
+    return float(column.sum())
+
+
+@pytest.mark.parametrize("method", ["fork", "spawn"])
+def test_process_pool_round_trip(method):
+    matches = _matches()
+
+    with SharedMatchArrays.export(matches) as shared:
+        context = multiprocessing.get_context(method)
+        with ProcessPoolExecutor(max_workers=2, mp_context=context) as executor:
+            sums = list(executor.map(_column_sum, [shared.spec] * 2, ["home_xg", "away_xg"]))
+            detached = executor.submit(_detached_column_sum, shared.spec, "home_xg").result()
+
+    assert sums == pytest.approx([matches["home_xg"].sum(), matches["away_xg"].sum()])
+    assert detached == pytest.approx(matches["home_xg"].sum())
+
+
+def test_column_outlives_attached_container():
+    matches = _matches()
+
+    with SharedMatchArrays.export(matches) as shared:
+        arrays = SharedMatchArrays.attach(shared.spec)
+        column = arrays["home_xg"]
+        del arrays
+        gc.collect()
+
+        assert column.sum() == pytest.approx(matches["home_xg"].sum())
+
+
+def test_column_outlives_export_close():
+    matches = _matches()
+
+    shared = SharedMatchArrays.export(matches)
+    column = shared.arrays["away_xg"]
+    spec = shared.spec
+    shared.close()
+    gc.collect()
+
+    # El nombre ya no existe, pero la memoria sigue mapeada para la vista
+    assert column.sum() == pytest.approx(matches["away_xg"].sum())
+    with pytest.raises(FileNotFoundError):
+        SharedMatchArrays.attach(spec)
+
+
+def test_memmap_round_trip(tmp_path):
+    matches = _matches()
+    shared = SharedMatchArrays.export_memmap(matches, str(tmp_path / "matches.bin"))
+
+    arrays = SharedMatchArrays.attach(shared.spec)
+
+    assert list(arrays["home_team"]) == list(matches["home_team"])
+    assert arrays["home_xg"].sum() == pytest.approx(matches["home_xg"].sum())
+    assert not arrays["home_xg"].flags.writeable
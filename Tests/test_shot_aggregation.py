@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from processing.shot_aggregation import join_shot_aggregates
+
+
+def _matches():
+    return pd.DataFrame({
+        "date": pd.to_datetime(["2023-08-11", "2023-08-12"]),
+        "home_team": ["Burnley", "Arsenal"],
+        "away_team": ["Manchester City", "Nottingham Forest"],
+    })
+
+
+def test_team_without_shots_gets_zero_counts():
+    # Solo el City tiró en el primer partido; el segundo no tiene datos
+    aggregates = pd.DataFrame({
+        "game": ["2023-08-11 Burnley-Manchester City"],
+        "date": pd.to_datetime(["2023-08-11"]),
+        "team": ["Manchester City"],
+        "np_xg": [2.1],
+        "shots": [17],
+        "big_chances": [4],
+        "big_chance_share": [0.6],
+        "set_piece_xg": [0.3],
+    })
+
+    joined = join_shot_aggregates(_matches(), aggregates)
+
+    for col in ("np_xg", "shots", "big_chances", "set_piece_xg"):
+        assert joined.loc[0, f"home_shot_{col}"] == 0
+    assert np.isnan(joined.loc[0, "home_shot_big_chance_share"])
+    assert joined.loc[0, "away_shot_shots"] == 17
+
+    unmatched = joined.loc[1, [c for c in joined.columns if "_shot_" in c]]
+    assert unmatched.isna().all()
@@ -0,0 +1,44 @@
+import numpy as np
+
+from ml.simulator import (
+    SIMULATED_PROBABILITIES, adaptive_monte_carlo_simulation, qmc_simulation, wilson_standard_errors
+)
+
+
+def test_wilson_standard_error_is_positive_at_the_bounds():
+    errors = wilson_standard_errors(np.array([0, 20000]), 20000)
+
+    assert np.all(errors > 0)
+
+
+def test_rare_outcome_does_not_stop_the_run_early():
+    # over_2_5 ~ 1e-4: casi sin aciertos en el primer bloque
+    result = adaptive_monte_carlo_simulation(
+        0.05, 0.05, tolerance=0.01, chunk_size=20000, min_simulations=0, seed=0
+    )
+
+    assert result["n_simulations"] > 20000
+    assert result["over_2_5"] * result["n_simulations"] >= 10
+    assert result["converged"]
+
+
+def test_targets_choose_what_must_converge():
+    result = adaptive_monte_carlo_simulation(
+        0.05, 0.05, tolerance=0.01, chunk_size=20000, min_simulations=0,
+        targets=("home_win", "draw", "away_win"), seed=0
+    )
+
+    assert result["n_simulations"] == 20000
+
+
+def test_qmc_batch_matches_single_pairs():
+    home = np.array([0.8, 1.4, 2.1])
+    away = np.array([1.6, 1.1, 0.7])
+
+    batch = qmc_simulation(home, away, n_simulations=512, n_replicates=4, seed=7)
+
+    # Con números aleatorios comunes cada par ve los mismos puntos que solo
+    for k in range(len(home)):
+        single = qmc_simulation(home[k], away[k], n_simulations=512, n_replicates=4, seed=7)
+        for name in SIMULATED_PROBABILITIES:
+            assert np.isclose(batch[name][k], single[name])
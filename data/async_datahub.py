@@ -0,0 +1,130 @@
+# data/async_datahub.py
+import asyncio
+import pandas as pd
+from typing import Optional, Dict, Any
+
+from data.datahub import DataHub
+from scrapers.async_runner import run_blocking
+
+
+class AsyncDataHub:
+    """
+    Fachada asíncrona del DataHub
+
+    Las consultas de equipo o liga lanzan a la vez todos los tipos de
+    estadística y todas las fuentes; cada llamada bloqueante se ejecuta en
+    el executor compartido, limitada por el semáforo de su fuente.
+
+    Las llamadas van a los métodos síncronos del DataHub dentro del
+    executor: el scraper (que para FBref arranca Chrome) se crea fuera del
+    event loop, y un fallo al crearlo devuelve None igual que en DataHub.
+    """
+
+    def __init__(self, league: str, season: str = "2324", hub: Optional[DataHub] = None):
+        """
+        Args:
+            league: Código de liga (ej. 'ENG-Premier League')
+            season: Código de temporada (ej. '2324' para 2023-24)
+            hub: DataHub existente a reutilizar (caché y mapeos incluidos)
+        """
+        self.hub = hub if hub is not None else DataHub(league, season)
+        self.league = self.hub.league
+        self.season = self.hub.season
+
+    # ==================== FUENTES ====================
+
+    async def get_understat_data(self) -> Dict[str, Optional[pd.DataFrame]]:
+        """Obtiene datos de Understat (usa la caché del DataHub)"""
+        return await run_blocking("understat", self.hub.get_understat_data)
+
+    async def get_understat_schedule(self) -> Optional[pd.DataFrame]:
+        """Obtiene el calendario de Understat"""
+        data = await self.get_understat_data()
+        return data.get("schedule")
+
+    async def get_understat_team_stats(self) -> Optional[pd.DataFrame]:
+        """Obtiene estadísticas de equipos de Understat"""
+        data = await self.get_understat_data()
+        return data.get("team_match_stats")
+
+    async def get_fbref_schedule(self) -> Optional[pd.DataFrame]:
+        """Obtiene calendario de FBref"""
+        return await run_blocking("fbref", self.hub.get_fbref_schedule)
+
+    async def get_fbref_team_season_stats(self, stat_type: str = "standard") -> Optional[pd.DataFrame]:
+        """Obtiene estadísticas de temporada de equipos de FBref"""
+        return await run_blocking("fbref", self.hub.get_fbref_team_season_stats, stat_type)
+
+    async def get_fbref_stats(self, stat_types) -> Dict[str, Optional[pd.DataFrame]]:
+        """
+        Obtiene varios tipos de estadística de FBref en paralelo
+
+        Returns:
+            Dict stat_type -> DataFrame (o None si falla)
+        """
+        results = await asyncio.gather(
+            *(self.get_fbref_team_season_stats(stat_type) for stat_type in stat_types)
+        )
+        return dict(zip(stat_types, results))
+
+    async def get_sofascore_league_table(self) -> Optional[pd.DataFrame]:
+        """Obtiene tabla de liga de Sofascore"""
+        return await run_blocking("sofascore", self.hub.get_sofascore_league_table)
+
+    async def get_sofascore_schedule(self) -> Optional[pd.DataFrame]:
+        """Obtiene calendario de Sofascore"""
+        return await run_blocking("sofascore", self.hub.get_sofascore_schedule)
+
+    # ==================== MÉTODOS COMBINADOS ====================
+
+    async def get_all_schedules(self) -> Dict[str, Optional[pd.DataFrame]]:
+        """Obtiene calendarios de todas las fuentes en paralelo"""
+        understat, fbref, sofascore = await asyncio.gather(
+            self.get_understat_schedule(),
+            self.get_fbref_schedule(),
+            self.get_sofascore_schedule()
+        )
+        return {'understat': understat, 'fbref': fbref, 'sofascore': sofascore}
+
+    async def get_match_table(self) -> Optional[pd.DataFrame]:
+        """Versión asíncrona de DataHub.get_match_table (calendarios en paralelo)"""
+        if 'match_table' in self.hub._cache:
+            return self.hub._cache['match_table']
+
+        schedules = await self.get_all_schedules()
+        return self.hub._build_match_table(schedules)
+
+    async def get_team_data(self, team_name: str) -> Dict[str, Any]:
+        """Versión asíncrona de DataHub.get_team_data"""
+        _, fbref_stats = await asyncio.gather(
+            self.get_match_table(),
+            self.get_fbref_stats(DataHub.TEAM_STAT_TYPES)
+        )
+        return self.hub._build_team_data(team_name, fbref_stats)
+
+    async def get_match_data(self, home_team: str, away_team: str) -> Dict[str, Any]:
+        """Versión asíncrona de DataHub.get_match_data"""
+        await self.get_match_table()
+        return self.hub.get_match_data(home_team, away_team)
+
+    async def get_league_overview(self) -> Dict[str, Any]:
+        """Versión asíncrona de DataHub.get_league_overview"""
+        table, fbref_stats, schedules = await asyncio.gather(
+            self.get_sofascore_league_table(),
+            self.get_fbref_stats(DataHub.OVERVIEW_STAT_TYPES),
+            self.get_all_schedules()
+        )
+        return self.hub._build_league_overview(table, fbref_stats, schedules)
+
+
+# Ejemplo de uso
+if __name__ == "__main__":
+    async def _demo():
+        hub = AsyncDataHub("ENG-Premier League", "2324")
+        arsenal_data, overview = await asyncio.gather(
+            hub.get_team_data("Arsenal"),
+            hub.get_league_overview()
+        )
+        print("AsyncDataHub funcionando correctamente")
+
+    asyncio.run(_demo())
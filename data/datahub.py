@@ -2,7 +2,8 @@
 import pandas as pd
 import numpy as np
 import logging
-from typing import Optional, Dict, List, Any, Union
+import threading
+from typing import Optional, Dict, List, Any, Union, Callable
 from datetime import datetime
 import json
 
@@ -10,6 +11,10 @@ import json
 from scrapers.understat_scraper import get_data as get_understat_data
 from scrapers.fbref_scraper import FBrefScraper
 from scrapers.sofascore_scraper import SofascoreScraper
+from scrapers.request_scheduler import PRIORITY_INTERACTIVE
+from processing.shot_aggregation import ShotAggregateStore, build_shot_aggregates
+from processing.pipeline import fingerprint
+from processing.player_impact import PlayerImpactTable
 
 class DataHub:
     """
@@ -17,44 +22,107 @@ class DataHub:
     Arquitectura modular tipo microservicios - cada scraper es independiente
     """
     
-    def __init__(self, league: str, season: str = "2324"):
+    # Tipos de estadística de FBref usados en las consultas combinadas
+    TEAM_STAT_TYPES = ['standard', 'shooting', 'passing', 'defense']
+    OVERVIEW_STAT_TYPES = ['standard', 'shooting', 'possession']
+    
+    # Registro de fuentes: nombre -> fábrica(league, season, priority)
+    SOURCE_REGISTRY: Dict[str, Callable[[str, str, int], Any]] = {}
+    
+    # Scrapers ya construidos, compartidos entre instancias:
+    # (fuente, liga, temporada, prioridad) -> scraper
+    _shared_sources: Dict[tuple, Any] = {}
+    _sources_lock = threading.Lock()
+    
+    def __init__(self, league: str, season: str = "2324", priority: int = PRIORITY_INTERACTIVE):
         """
-        Inicializa el DataHub con todos los scrapers
+        Inicializa el DataHub (los scrapers se crean al primer uso)
         
         Args:
             league: Código de liga (ej. 'ENG-Premier League')
             season: Código de temporada (ej. '2324' para 2023-24)
+            priority: Prioridad de sus peticiones en el planificador
+                (PRIORITY_BULK para cargas masivas)
         """
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+        
         self.league = league
         self.season = season
-        
-        # Inicializar scrapers (cada uno es un "microservicio" independiente)
-        self._init_scrapers()
+        self.priority = priority
         
         # Diccionario para cachear datos
         self._cache = {}
         
+        # Tabla unificada de partidos: índice por equipo y filas sin pareja
+        # (de la fuente en la tabla, y de la tabla en la fuente)
+        self._team_rows = {}
+        self.unmatched_matches = {}
+        self.missing_matches = {}
+        
+        # Huella de los calendarios con los que se construyó la tabla
+        self._schedules_fingerprint = None
+        
         # Mapeo de nombres de equipos entre diferentes fuentes
         self.team_mappings = self._load_team_mappings()
+    
+    # ==================== FUENTES ====================
+    
+    @classmethod
+    def register_source(cls, name: str, factory: Callable[[str, str, int], Any]):
+        """
+        Registra una fuente de datos (cada una es un "microservicio" independiente)
         
-        logging.basicConfig(level=logging.INFO)
-        self.logger = logging.getLogger(__name__)
+        La fábrica no se llama hasta que algún DataHub accede a la fuente,
+        y su resultado se comparte entre instancias de la misma liga,
+        temporada y prioridad.
+        
+        Args:
+            name: Nombre de la fuente (ej. 'fbref')
+            factory: Callable (league, season, priority) -> scraper
+        """
+        cls.SOURCE_REGISTRY[name] = factory
     
-    def _init_scrapers(self):
-        """Inicializa todos los scrapers"""
-        try:
-            # Understat (usando tu función get_data)
-            self.understat = lambda: get_understat_data(self.league)
-            
-            # FBref
-            self.fbref = FBrefScraper(self.league, self.season)
-            
-            # Sofascore
-            self.sofascore = SofascoreScraper(self.league, self.season)
-            
-            self.logger.info("✅ Scrapers inicializados correctamente")
-        except Exception as e:
-            self.logger.error(f"❌ Error inicializando scrapers: {e}")
+    def get_source(self, name: str) -> Any:
+        """
+        Devuelve el scraper de una fuente, creándolo en el primer acceso
+        
+        Raises:
+            KeyError: Si la fuente no está registrada
+        """
+        key = (name, self.league, self.season, self.priority)
+        
+        source = self._shared_sources.get(key)
+        if source is not None:
+            return source
+        
+        factory = self.SOURCE_REGISTRY[name]
+        
+        with self._sources_lock:
+            if key not in self._shared_sources:
+                try:
+                    self._shared_sources[key] = factory(self.league, self.season, self.priority)
+                    self.logger.info(f"✅ Scraper {name} inicializado")
+                except Exception as e:
+                    self.logger.error(f"❌ Error inicializando scraper {name}: {e}")
+                    raise
+        
+        return self._shared_sources[key]
+    
+    @property
+    def understat(self) -> Callable[[], Dict[str, Optional[pd.DataFrame]]]:
+        """Understat (usando tu función get_data)"""
+        return self.get_source('understat')
+    
+    @property
+    def fbref(self) -> FBrefScraper:
+        """FBref (se crea al primer acceso)"""
+        return self.get_source('fbref')
+    
+    @property
+    def sofascore(self) -> SofascoreScraper:
+        """Sofascore (se crea al primer acceso)"""
+        return self.get_source('sofascore')
     
     def _load_team_mappings(self) -> Dict[str, str]:
         """
@@ -165,7 +233,7 @@ class DataHub:
             return self._cache[cache_key]
         
         try:
-            data = get_understat_data(self.league)
+            data = get_understat_data(self.league, self.priority)
             self._cache[cache_key] = data
             self.logger.info("✅ Datos de Understat obtenidos")
             return data
@@ -222,14 +290,98 @@ class DataHub:
             self.logger.error(f"❌ Error en FBref player season stats: {e}")
             return None
     
-    def get_fbref_shot_events(self) -> Optional[pd.DataFrame]:
-        """Obtiene eventos de tiros de FBref"""
+    def get_fbref_player_match_stats(self) -> Optional[pd.DataFrame]:
+        """Obtiene estadísticas por partido de jugadores de FBref"""
+        try:
+            return self.fbref.get_player_match_stats()
+        except Exception as e:
+            self.logger.error(f"❌ Error en FBref player match stats: {e}")
+            return None
+    
+    def get_player_impact(self) -> Optional[PlayerImpactTable]:
+        """
+        Construye la tabla de impacto de jugadores (minutos y xG+xA por
+        equipo) a partir de las estadísticas por partido de FBref
+        
+        Se cachea hasta el siguiente refresh; los nombres de equipo
+        quedan estandarizados.
+        """
+        cache_key = 'player_impact'
+        if cache_key in self._cache:
+            return self._cache[cache_key]
+        
+        player_stats = self.get_fbref_player_match_stats()
+        if player_stats is None:
+            return None
+        
+        try:
+            impact = PlayerImpactTable().fit(player_stats, standardize=self.standardize_team_name)
+        except Exception as e:
+            self.logger.error(f"❌ Error construyendo impacto de jugadores: {e}")
+            return None
+        
+        self._cache[cache_key] = impact
+        return impact
+    
+    def get_fbref_shot_events(self, match_id: Optional[Union[str, List[str]]] = None) -> Optional[pd.DataFrame]:
+        """
+        Obtiene eventos de tiros de FBref
+        
+        Args:
+            match_id: game_id(s) de FBref (por defecto toda la temporada)
+        """
         try:
-            return self.fbref.get_shot_events()
+            return self.fbref.get_shot_events(match_id=match_id)
         except Exception as e:
             self.logger.error(f"❌ Error en FBref shot events: {e}")
             return None
     
+    def get_fbref_shot_aggregates(self, store_path: Optional[str] = None,
+                                  matches_per_chunk: int = 10) -> Optional[pd.DataFrame]:
+        """
+        Obtiene agregados de tiros por equipo y partido (xG sin penaltis,
+        tiros, ocasiones claras, xG a balón parado)
+        
+        Solo se descargan los partidos jugados que aún no están en el
+        store, en bloques de matches_per_chunk partidos, así que la
+        temporada completa nunca está en memoria. Cada bloque se añade al
+        store local en cuanto se procesa. Sin calendario de FBref se
+        descarga la temporada entera, como antes.
+        
+        Args:
+            store_path: Ruta del CSV de agregados (por defecto data/shot_aggregates.csv)
+            matches_per_chunk: Partidos por descarga
+        """
+        store = ShotAggregateStore(store_path) if store_path else ShotAggregateStore()
+        
+        schedule = self.get_fbref_schedule()
+        if schedule is not None and "game_id" in schedule.columns:
+            chunks = self._iter_new_shot_events(schedule, store.processed_games(), matches_per_chunk)
+        else:
+            chunks = [self.get_fbref_shot_events()]
+        
+        try:
+            build_shot_aggregates(chunks, store, matches_per_chunk)
+        except Exception as e:
+            self.logger.error(f"❌ Error agregando tiros de FBref: {e}")
+            return None
+        
+        return store.load()
+    
+    def _iter_new_shot_events(self, schedule: pd.DataFrame, processed: set,
+                              matches_per_chunk: int):
+        """Descarga por bloques los tiros de los partidos jugados que faltan en el store"""
+        games = schedule.reset_index()
+        # game_id solo existe cuando el partido tiene informe (ya se jugó)
+        games = games[games["game_id"].notna() & ~games["game"].isin(processed)]
+        game_ids = games.sort_values("date")["game_id"].tolist()
+        
+        if game_ids:
+            self.logger.info(f"Descargando tiros de {len(game_ids)} partidos nuevos de FBref")
+        
+        for start in range(0, len(game_ids), matches_per_chunk):
+            yield self.get_fbref_shot_events(match_id=game_ids[start:start + matches_per_chunk])
+    
     def get_fbref_lineups(self) -> Optional[pd.DataFrame]:
         """Obtiene alineaciones de FBref"""
         try:
@@ -256,6 +408,169 @@ class DataHub:
             self.logger.error(f"❌ Error en Sofascore schedule: {e}")
             return None
     
+    # ==================== TABLA UNIFICADA DE PARTIDOS ====================
+    
+    # Fuentes de calendario, en orden de prioridad (la primera es la base)
+    MATCH_TABLE_SOURCES = ['understat', 'fbref', 'sofascore']
+    
+    # Diferencia máxima de fecha entre fuentes (zonas horarias, aplazamientos del día)
+    MATCH_DATE_TOLERANCE = pd.Timedelta(days=1)
+    
+    def _normalize_schedule(self, schedule: pd.DataFrame, source: str) -> pd.DataFrame:
+        """
+        Deja un calendario con claves canónicas (date, home_team, away_team)
+        y el resto de columnas con prefijo de la fuente
+        """
+        # El índice (league, season, game) de soccerdata pasa a columnas
+        df = schedule.reset_index(drop=schedule.index.names == [None])
+        
+        # Estandarizar cada nombre distinto una sola vez
+        names = pd.unique(df[['home_team', 'away_team']].values.ravel())
+        mapping = {name: self.standardize_team_name(name) for name in names}
+        
+        dates = pd.to_datetime(df['date'])
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+        
+        keys = pd.DataFrame({
+            'date': dates.dt.normalize(),
+            'home_team': df['home_team'].map(mapping),
+            'away_team': df['away_team'].map(mapping),
+        })
+        
+        values = df.drop(columns=['date', 'home_team', 'away_team']).add_prefix(f'{source}_')
+        
+        return pd.concat([keys, values], axis=1).dropna(subset=['date', 'home_team', 'away_team'])
+    
+    def _build_match_table(self, schedules: Dict[str, Optional[pd.DataFrame]]) -> Optional[pd.DataFrame]:
+        """
+        Construye la tabla unificada de partidos a partir de los calendarios
+        
+        Las filas se emparejan por equipos canónicos y fecha (con
+        MATCH_DATE_TOLERANCE de margen). El informe de conciliación va en
+        los dos sentidos, por fuente:
+        - self.unmatched_matches[fuente]: partidos de la fuente sin pareja
+          en la tabla (se añaden igualmente)
+        - self.missing_matches[fuente]: partidos ya en la tabla (date,
+          home_team, away_team) sin pareja en la fuente; sus columnas de
+          esa fuente quedan vacías
+        
+        Args:
+            schedules: Dict fuente -> calendario (ver get_all_schedules)
+            
+        Returns:
+            DataFrame con una fila por partido y columnas por fuente
+        """
+        self.unmatched_matches = {}
+        self.missing_matches = {}
+        self._schedules_fingerprint = fingerprint(schedules)
+        table = None
+        
+        for source in self.MATCH_TABLE_SOURCES:
+            schedule = schedules.get(source)
+            if schedule is None or schedule.empty:
+                continue
+            
+            normalized = self._normalize_schedule(schedule, source)
+            
+            if table is None:
+                table = normalized
+                continue
+            
+            # Emparejar por equipos y quedarse con la fecha más cercana dentro del margen
+            table = table.reset_index(drop=True)
+            table['_row'] = np.arange(len(table))
+            normalized = normalized.reset_index(drop=True)
+            normalized['_source_row'] = np.arange(len(normalized))
+            
+            candidates = table[['_row', 'date', 'home_team', 'away_team']].merge(
+                normalized[['_source_row', 'date', 'home_team', 'away_team']],
+                on=['home_team', 'away_team'],
+                suffixes=('', '_source')
+            )
+            candidates['gap'] = (candidates['date'] - candidates['date_source']).abs()
+            candidates = candidates[candidates['gap'] <= self.MATCH_DATE_TOLERANCE]
+            candidates = candidates.sort_values('gap').drop_duplicates('_source_row')
+            candidates = candidates.drop_duplicates('_row')
+            
+            source_values = normalized.drop(columns=['date', 'home_team', 'away_team', '_source_row'])
+            matched = source_values.iloc[candidates['_source_row'].to_numpy()]
+            matched.index = candidates['_row'].to_numpy()
+            
+            missing = ~table['_row'].isin(candidates['_row'])
+            self.missing_matches[source] = (
+                table.loc[missing, ['date', 'home_team', 'away_team']].reset_index(drop=True)
+            )
+            if missing.any():
+                self.logger.warning(
+                    f"⚠️ {int(missing.sum())} partidos de la tabla unificada sin pareja en {source}"
+                )
+            
+            table = table.drop(columns='_row').join(matched)
+            
+            unmatched = normalized[~normalized['_source_row'].isin(candidates['_source_row'])]
+            unmatched = unmatched.drop(columns='_source_row')
+            self.unmatched_matches[source] = unmatched
+            
+            if not unmatched.empty:
+                self.logger.warning(
+                    f"⚠️ {len(unmatched)} partidos de {source} sin pareja en la tabla unificada"
+                )
+                table = pd.concat([table, unmatched], ignore_index=True)
+        
+        if table is None:
+            return None
+        
+        table = table.sort_values('date', kind='stable').reset_index(drop=True)
+        
+        # Índice por equipo: posiciones de sus partidos (local o visitante)
+        team_rows = {}
+        for column in ('home_team', 'away_team'):
+            for team, rows in table.groupby(column).indices.items():
+                team_rows.setdefault(team, []).append(rows)
+        self._team_rows = {team: np.sort(np.concatenate(rows)) for team, rows in team_rows.items()}
+        
+        self._cache['match_table'] = table
+        return table
+    
+    def get_match_table(self) -> Optional[pd.DataFrame]:
+        """
+        Obtiene la tabla unificada de partidos (Understat + FBref + Sofascore)
+        
+        Se construye una vez y se reutiliza hasta el siguiente refresh.
+        
+        Returns:
+            DataFrame con claves date, home_team, away_team (nombres canónicos)
+            y columnas understat_*, fbref_*, sofascore_*
+        """
+        if 'match_table' in self._cache:
+            return self._cache['match_table']
+        
+        return self._build_match_table(self.get_all_schedules())
+    
+    def get_team_matches(self, team_name: str) -> pd.DataFrame:
+        """Partidos de un equipo (local o visitante) desde la tabla unificada"""
+        table = self.get_match_table()
+        if table is None:
+            return pd.DataFrame()
+        
+        rows = self._team_rows.get(self.standardize_team_name(team_name))
+        if rows is None:
+            return table.iloc[0:0]
+        
+        return table.iloc[rows]
+    
+    def _source_columns(self, row: pd.Series, source: str) -> Optional[Dict[str, Any]]:
+        """Columnas de una fuente en una fila de la tabla (sin prefijo)"""
+        prefix = f'{source}_'
+        values = {col[len(prefix):]: row[col] for col in row.index if col.startswith(prefix)}
+        
+        if not values or all(pd.isna(value) for value in values.values()):
+            return None
+        
+        values.update(date=row['date'], home_team=row['home_team'], away_team=row['away_team'])
+        return values
+    
     # ==================== MÉTODOS COMBINADOS ====================
     
     def get_all_schedules(self) -> Dict[str, Optional[pd.DataFrame]]:
@@ -281,19 +596,32 @@ class DataHub:
         Returns:
             Dict con datos del equipo de todas las fuentes
         """
+        fbref_stats = {
+            stat_type: self.get_fbref_team_season_stats(stat_type)
+            for stat_type in self.TEAM_STAT_TYPES
+        }
+        
+        return self._build_team_data(team_name, fbref_stats)
+    
+    def _build_team_data(self, team_name: str,
+                         fbref_stats: Dict[str, Optional[pd.DataFrame]]) -> Dict[str, Any]:
+        """
+        Combina la tabla unificada y las estadísticas de FBref para un equipo
+        
+        Args:
+            team_name: Nombre del equipo
+            fbref_stats: Dict stat_type -> estadísticas de temporada de FBref
+        """
         std_name = self.standardize_team_name(team_name)
         team_data = {'standardized_name': std_name, 'original_name': team_name}
         
-        # Datos de Understat
-        understat_stats = self.get_understat_team_stats()
-        if understat_stats is not None:
-            team_understat = understat_stats[understat_stats['team'] == std_name]
-            if not team_understat.empty:
-                team_data['understat'] = team_understat.to_dict('records')
+        # Partidos de todas las fuentes
+        matches = self.get_team_matches(std_name)
+        if not matches.empty:
+            team_data['matches'] = matches.to_dict('records')
         
         # Datos de FBref (estadísticas de temporada)
-        for stat_type in ['standard', 'shooting', 'passing', 'defense']:
-            stats = self.get_fbref_team_season_stats(stat_type)
+        for stat_type, stats in fbref_stats.items():
             if stats is not None:
                 # Buscar por nombre estandarizado en las columnas de equipo
                 team_col = next((col for col in stats.columns if 'team' in col.lower()), None)
@@ -326,25 +654,15 @@ class DataHub:
             'sources': {}
         }
         
-        # Buscar en Understat schedule
-        understat_schedule = self.get_understat_schedule()
-        if understat_schedule is not None:
-            match = understat_schedule[
-                (understat_schedule['home_team'] == home_std) & 
-                (understat_schedule['away_team'] == away_std)
-            ]
-            if not match.empty:
-                match_data['sources']['understat'] = match.iloc[0].to_dict()
-        
-        # Buscar en FBref schedule
-        fbref_schedule = self.get_fbref_schedule()
-        if fbref_schedule is not None:
-            match = fbref_schedule[
-                (fbref_schedule['home_team'].str.contains(home_std, na=False)) & 
-                (fbref_schedule['away_team'].str.contains(away_std, na=False))
-            ]
-            if not match.empty:
-                match_data['sources']['fbref'] = match.iloc[0].to_dict()
+        matches = self.get_team_matches(home_std)
+        matches = matches[(matches['home_team'] == home_std) & (matches['away_team'] == away_std)]
+        
+        if not matches.empty:
+            row = matches.iloc[0]
+            for source in self.MATCH_TABLE_SOURCES:
+                values = self._source_columns(row, source)
+                if values is not None:
+                    match_data['sources'][source] = values
         
         return match_data
     
@@ -358,19 +676,17 @@ class DataHub:
             n_matches: Número de partidos a obtener
             
         Returns:
-            DataFrame con enfrentamientos directos
+            DataFrame con enfrentamientos directos (filas de la tabla unificada)
         """
         team1_std = self.standardize_team_name(team1)
         team2_std = self.standardize_team_name(team2)
         
-        # Usar Understat para H2H (tiene datos históricos confiables)
-        schedule = self.get_understat_schedule()
-        if schedule is None:
+        matches = self.get_team_matches(team1_std)
+        if matches.empty:
             return pd.DataFrame()
         
-        h2h = schedule[
-            ((schedule['home_team'] == team1_std) & (schedule['away_team'] == team2_std)) |
-            ((schedule['home_team'] == team2_std) & (schedule['away_team'] == team1_std))
+        h2h = matches[
+            (matches['home_team'] == team2_std) | (matches['away_team'] == team2_std)
         ].tail(n_matches)
         
         return h2h
@@ -382,6 +698,21 @@ class DataHub:
         Returns:
             Dict con overview de la liga
         """
+        fbref_stats = {
+            stat_type: self.get_fbref_team_season_stats(stat_type)
+            for stat_type in self.OVERVIEW_STAT_TYPES
+        }
+        
+        return self._build_league_overview(
+            self.get_sofascore_league_table(),
+            fbref_stats,
+            self.get_all_schedules()
+        )
+    
+    def _build_league_overview(self, sofascore_table: Optional[pd.DataFrame],
+                               fbref_stats: Dict[str, Optional[pd.DataFrame]],
+                               schedules: Dict[str, Optional[pd.DataFrame]]) -> Dict[str, Any]:
+        """Combina los datos ya descargados en la vista general de la liga"""
         overview = {
             'league': self.league,
             'season': self.season,
@@ -389,19 +720,15 @@ class DataHub:
         }
         
         # Tabla de liga de Sofascore
-        overview['sources']['sofascore_table'] = self.get_sofascore_league_table()
+        overview['sources']['sofascore_table'] = sofascore_table
         
         # Estadísticas de equipos de FBref
-        fbref_stats = {}
-        for stat_type in ['standard', 'shooting', 'possession']:
-            stats = self.get_fbref_team_season_stats(stat_type)
-            if stats is not None:
-                fbref_stats[stat_type] = stats
-        
-        overview['sources']['fbref_stats'] = fbref_stats
+        overview['sources']['fbref_stats'] = {
+            stat_type: stats for stat_type, stats in fbref_stats.items()
+            if stats is not None
+        }
         
         # Próximos partidos
-        schedules = self.get_all_schedules()
         overview['sources']['schedules'] = schedules
         
         return overview
@@ -409,13 +736,52 @@ class DataHub:
     def clear_cache(self):
         """Limpia la caché de datos"""
         self._cache.clear()
+        self._team_rows = {}
+        self.unmatched_matches = {}
+        self.missing_matches = {}
+        self._schedules_fingerprint = None
         self.logger.info("Caché limpiada")
     
-    def refresh_all_data(self):
-        """Refresca todos los datos limpiando caché y obteniendo datos nuevos"""
+    def refresh_all_data(self) -> bool:
+        """
+        Refresca todos los datos limpiando caché y obteniendo datos nuevos
+        
+        La tabla unificada solo se reconstruye si la huella de los
+        calendarios ha cambiado; si no, se conserva la anterior.
+        
+        Returns:
+            True si la tabla de partidos se ha reconstruido
+        """
+        previous = (
+            self._cache.get('match_table'), self._team_rows,
+            self.unmatched_matches, self.missing_matches, self._schedules_fingerprint
+        )
+        
         self.clear_cache()
-        self.get_understat_data()  
+        schedules = self.get_all_schedules()
+        
+        if previous[0] is not None and fingerprint(schedules) == previous[4]:
+            self._cache['match_table'] = previous[0]
+            (self._team_rows, self.unmatched_matches,
+             self.missing_matches, self._schedules_fingerprint) = previous[1:]
+            self.logger.info("Datos refrescados (calendarios sin cambios)")
+            return False
+        
+        self._build_match_table(schedules)
         self.logger.info("Datos refrescados")
+        return True
+
+
+# Fuentes por defecto
+DataHub.register_source(
+    'understat', lambda league, season, priority: lambda: get_understat_data(league, priority)
+)
+DataHub.register_source(
+    'fbref', lambda league, season, priority: FBrefScraper(league, season, priority=priority)
+)
+DataHub.register_source(
+    'sofascore', lambda league, season, priority: SofascoreScraper(league, season, priority=priority)
+)
 
 
 # Ejemplo de uso
@@ -0,0 +1,267 @@
+# data/shared_arrays.py
+import os
+import sys
+import numpy as np
+import pandas as pd
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+# Columnas numéricas por defecto de team_match_stats de Understat
+MATCH_COLUMNS = [
+    "home_goals", "away_goals",
+    "home_xg", "away_xg",
+    "home_np_xg", "away_np_xg",
+    "home_ppda", "away_ppda",
+    "home_deep_completions", "away_deep_completions",
+]
+
+_ALIGNMENT = 64
+
+
+class MatchArrays:
+    """
+    Vista de solo lectura de un partido por fila, columna a columna
+
+    Se indexa como un DataFrame (arrays["home_xg"]) pero cada columna es
+    un array de NumPy sobre memoria compartida o un fichero mapeado.
+    home_team / away_team se resuelven desde los códigos home_id / away_id.
+
+    Cada columna mantiene vivo el bloque a través de su .base, así que
+    puede seguir usándose después de soltar el MatchArrays.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], team_names: List[str]):
+        self._columns = columns
+        self.team_names = list(team_names)
+        self._names = np.asarray(self.team_names, dtype=object)
+
+    def __len__(self) -> int:
+        return len(self._columns["home_id"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name == "home_team":
+            return self._names[self._columns["home_id"]]
+        if name == "away_team":
+            return self._names[self._columns["away_id"]]
+        return self._columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._columns or name in ("home_team", "away_team")
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Copia a DataFrame (para depurar, no para los workers)"""
+        frame = pd.DataFrame({name: np.array(values) for name, values in self._columns.items()})
+        frame["home_team"] = self["home_team"]
+        frame["away_team"] = self["away_team"]
+        return frame
+
+    def close(self):
+        """
+        Suelta las columnas; el bloque se desmapea cuando deja de haber
+        vistas sobre él
+        """
+        self._columns = {}
+
+
+def _collect_columns(df: pd.DataFrame, columns: Optional[List[str]]) -> Tuple[Dict[str, np.ndarray], List[str]]:
+    df = df.reset_index()
+
+    codes, teams = pd.factorize(
+        np.concatenate([df["home_team"].to_numpy(), df["away_team"].to_numpy()])
+    )
+
+    arrays = {
+        "home_id": codes[:len(df)].astype(np.int32),
+        "away_id": codes[len(df):].astype(np.int32),
+        "date": pd.to_datetime(df["date"]).to_numpy().astype("datetime64[ns]"),
+    }
+
+    for name in columns if columns is not None else MATCH_COLUMNS:
+        if name in df.columns:
+            arrays[name] = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)
+
+    return arrays, [str(team) for team in teams]
+
+
+def _layout(arrays: Dict[str, np.ndarray]) -> Tuple[List[Dict[str, Any]], int]:
+    # Columnas contiguas y alineadas dentro de un único bloque
+    layout = []
+    offset = 0
+    for name, values in arrays.items():
+        layout.append({"name": name, "dtype": values.dtype.str, "offset": offset})
+        offset += values.nbytes
+        offset += -offset % _ALIGNMENT
+    return layout, max(offset, 1)
+
+
+class _SharedBlock:
+    """
+    Dueño del bloque de memoria compartida
+
+    np.ndarray(buffer=shm.buf) no retiene el buffer: si el SharedMemory se
+    cierra o se recolecta, las vistas apuntan a memoria desmapeada. Los
+    arrays creados desde este objeto (vía __array_interface__) lo tienen
+    como .base, así que el SharedMemory vive mientras quede alguna vista.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory):
+        self.shm = shm
+        address = np.frombuffer(shm.buf, dtype=np.uint8).ctypes.data
+        self.__array_interface__ = {
+            "shape": (shm.size,),
+            "typestr": "|u1",
+            "data": (address, False),
+            "version": 3,
+        }
+
+
+def _block(handle: Any) -> np.ndarray:
+    # Bloque completo como array de bytes; las columnas son cortes de él
+    if isinstance(handle, shared_memory.SharedMemory):
+        return np.asarray(_SharedBlock(handle))
+    return handle
+
+
+def _views(block: np.ndarray, spec: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    views = {}
+    for column in spec["layout"]:
+        dtype = np.dtype(column["dtype"])
+        start = column["offset"]
+        view = block[start:start + spec["n_matches"] * dtype.itemsize].view(dtype)
+        view.flags.writeable = False
+        views[column["name"]] = view
+    return views
+
+
+def _open_untracked(name: str) -> shared_memory.SharedMemory:
+    """
+    Abre un bloque existente sin registrarlo en el resource tracker
+
+    Solo el proceso que lo exporta debe hacer el unlink; si un proceso
+    que se limita a abrirlo lo registra, su tracker lo borra (y avisa de
+    una fuga) al terminar. En Python < 3.13 no existe track=False.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == "posix":
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class SharedMatchArrays:
+    """
+    Exporta una vez las columnas numéricas de team_match_stats (y los
+    códigos de equipo) para que los workers las lean sin copia
+
+    El proceso padre crea el bloque con export() / export_memmap() y pasa
+    `spec` (un dict pequeño y picklable) a los workers, que llaman a
+    attach(spec) para obtener un MatchArrays sobre la misma memoria.
+    """
+
+    def __init__(self, spec: Dict[str, Any], handle: Any):
+        self.spec = spec
+        self._handle = handle
+
+    @classmethod
+    def export(cls, df: pd.DataFrame, columns: Optional[List[str]] = None,
+               name: Optional[str] = None) -> "SharedMatchArrays":
+        """
+        Copia las columnas a un bloque de multiprocessing.shared_memory
+
+        Args:
+            df: team_match_stats (home_team, away_team, date, numéricas)
+            columns: Columnas numéricas a exportar (por defecto MATCH_COLUMNS)
+            name: Nombre del bloque (por defecto uno aleatorio)
+        """
+        arrays, team_names = _collect_columns(df, columns)
+        layout, size = _layout(arrays)
+
+        shm = shared_memory.SharedMemory(
+            name=name or f"matches_{uuid.uuid4().hex[:12]}", create=True, size=size
+        )
+
+        spec = {
+            "backend": "shm",
+            "name": shm.name,
+            "n_matches": len(arrays["home_id"]),
+            "layout": layout,
+            "team_names": team_names,
+        }
+
+        for values, target in zip(arrays.values(), _views(_block(shm), spec).values()):
+            target.flags.writeable = True
+            target[:] = values
+
+        return cls(spec, shm)
+
+    @classmethod
+    def export_memmap(cls, df: pd.DataFrame, path: str,
+                      columns: Optional[List[str]] = None) -> "SharedMatchArrays":
+        """
+        Igual que export() pero sobre un fichero mapeado en memoria, que
+        sobrevive al proceso y puede abrirse desde otras máquinas/sesiones
+        """
+        arrays, team_names = _collect_columns(df, columns)
+        layout, size = _layout(arrays)
+
+        spec = {
+            "backend": "memmap",
+            "name": path,
+            "n_matches": len(arrays["home_id"]),
+            "layout": layout,
+            "team_names": team_names,
+        }
+
+        mapped = np.memmap(path, dtype=np.uint8, mode="w+", shape=(size,))
+        for values, target in zip(arrays.values(), _views(mapped, spec).values()):
+            target.flags.writeable = True
+            target[:] = values
+        mapped.flush()
+
+        return cls(spec, mapped)
+
+    @staticmethod
+    def attach(spec: Dict[str, Any]) -> MatchArrays:
+        """
+        Abre desde un worker el bloque descrito por `spec` (sin copia)
+        """
+        if spec["backend"] == "memmap":
+            block = np.memmap(spec["name"], dtype=np.uint8, mode="r")
+        else:
+            block = _block(_open_untracked(spec["name"]))
+
+        return MatchArrays(_views(block, spec), spec["team_names"])
+
+    @property
+    def arrays(self) -> MatchArrays:
+        """Vista en el propio proceso que exportó"""
+        if self._handle is None:
+            raise RuntimeError("SharedMatchArrays cerrado")
+        return MatchArrays(_views(_block(self._handle), self.spec), self.spec["team_names"])
+
+    def close(self):
+        """
+        Libera el bloque (solo desde el proceso que lo exportó)
+
+        Hace el unlink del nombre; la memoria se desmapea cuando ya no
+        queda ninguna vista sobre ella.
+        """
+        if isinstance(self._handle, shared_memory.SharedMemory):
+            if os.name == "posix" and sys.version_info < (3, 13):
+                # Un worker que comparta el tracker pudo desregistrarlo al abrirlo
+                resource_tracker.register(self._handle._name, "shared_memory")
+            self._handle.unlink()
+        self._handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
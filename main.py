@@ -3,7 +3,9 @@ from scrapers.understat_scraper import get_data
 from processing.feature_engineering import team_averages
 from ml.model import calculate_strengths, calculate_lambdas, backtest_model
 from ml.simulator import monte_carlo_simulation
+from ml.markets import price_match
 from processing.clustering import cluster_teams
+from processing.pipeline import Pipeline, DEFAULT_CACHE_DIR
 
 MATCHUP_MATRIX = {
     0: {0: 0.95, 1: 0.85, 2: 0.90, 3: 0.92},
@@ -12,6 +14,87 @@ MATCHUP_MATRIX = {
     3: {0: 1.08, 1: 0.98, 2: 1.02, 3: 1.00},
 }
 
+# Tolerancia de las fuerzas en el pipeline: cambios por debajo de 0.0005
+# no vuelven a ejecutar clustering, backtest ni simulación
+STRENGTH_DECIMALS = 3
+
+
+# ===============================
+# PIPELINE STAGES
+# ===============================
+def _strengths_stage(data):
+    team_stats, league_home_xg_avg, league_away_xg_avg = calculate_strengths(data["team_match_stats"])
+    # Filas por equipo, no por primera aparición: un partido antiguo que
+    # aparece no reordena la tabla (ni cambia su huella)
+    team_stats = team_stats.sort_values("team").reset_index(drop=True)
+    return team_stats, league_home_xg_avg, league_away_xg_avg
+
+
+def _clusters_stage(strengths):
+    # cluster_teams añade la columna in place: nunca sobre el valor cacheado
+    team_stats, model = cluster_teams(strengths[0].copy())
+    return team_stats, model
+
+
+def _backtest_stage(data, strengths, clusters, matchup_matrix):
+    _, league_home_xg_avg, league_away_xg_avg = strengths
+    return backtest_model(
+        data["team_match_stats"],
+        clusters[0],
+        league_home_xg_avg,
+        league_away_xg_avg,
+        matchup_matrix
+    )
+
+
+def _lambdas_stage(strengths, clusters, home, away, matchup_matrix):
+    team_stats, league_home_xg_avg, league_away_xg_avg = strengths
+    home_lambda, away_lambda = calculate_lambdas(
+        home, away, team_stats, league_home_xg_avg, league_away_xg_avg
+    )
+
+    clustered = clusters[0]
+    home_cluster = clustered[clustered["team"] == home]["cluster"].values[0]
+    away_cluster = clustered[clustered["team"] == away]["cluster"].values[0]
+
+    return {
+        "home_lambda": home_lambda,
+        "away_lambda": away_lambda,
+        "matchup_factor": matchup_matrix[home_cluster][away_cluster],
+    }
+
+
+def _simulation_stage(lambdas):
+    factor = lambdas["matchup_factor"]
+    return monte_carlo_simulation(lambdas["home_lambda"] * factor, lambdas["away_lambda"] * factor)
+
+
+def build_pipeline(league, home=None, away=None, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Stages of the prediction flow, memoized on disk.
+
+    Only "data" is re-read on every run. Strengths are fingerprinted to
+    STRENGTH_DECIMALS decimals: recency weighting moves every strength a
+    little whenever a match is added, so a refresh whose strengths move
+    less than that tolerance (e.g. a very old match appearing) reuses the
+    stored clustering, backtest and simulation, computed from the
+    previous strengths.
+    """
+    pipeline = Pipeline(cache_dir)
+
+    pipeline.add("data", get_data, params={"league": league}, volatile=True)
+    pipeline.add("strengths", _strengths_stage, ["data"], decimals=STRENGTH_DECIMALS)
+    pipeline.add("clusters", _clusters_stage, ["strengths"])
+    pipeline.add("backtest", _backtest_stage, ["data", "strengths", "clusters"],
+                 params={"matchup_matrix": MATCHUP_MATRIX})
+
+    if home and away:
+        pipeline.add("lambdas", _lambdas_stage, ["strengths", "clusters"],
+                     params={"home": home, "away": away, "matchup_matrix": MATCHUP_MATRIX})
+        pipeline.add("simulation", _simulation_stage, ["lambdas"])
+
+    return pipeline
+
 
 def main():
     parser = argparse.ArgumentParser(description="Football Betting Model")
@@ -28,12 +111,17 @@ def main():
     parser.add_argument("--away", type=str,
                         help="Away team for match prediction")
 
+    parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR,
+                        help="Directory for memoized pipeline stages")
+
     args = parser.parse_args()
 
+    pipeline = build_pipeline(args.league, args.home, args.away, args.cache_dir)
+
     # ===============================
     # 1️⃣ LOAD DATA
     # ===============================
-    data = get_data(args.league)
+    data = pipeline.run(["data"])["data"]
 
     print("\n=== LEAGUE LOADED ===")
     print(data["schedule"].head())
@@ -71,61 +159,36 @@ def main():
 
         print(f"\n=== PREDICTION: {args.home} vs {args.away} ===")
 
-        # Calculate strengths
-        team_stats, league_home_xg_avg, league_away_xg_avg = calculate_strengths(
-            data["team_match_stats"]
-        )
-
-        home_lambda, away_lambda = calculate_lambdas(
-            args.home,
-            args.away,
-            team_stats,
-            league_home_xg_avg,
-            league_away_xg_avg
-        )
-
-        team_stats, model = cluster_teams(team_stats)
-
-        # BACKTEST
-        log_loss, brier = backtest_model(
-            data["team_match_stats"],   
-            team_stats,
-            league_home_xg_avg,
-            league_away_xg_avg,
-            MATCHUP_MATRIX
-        )
+        stages = pipeline.run(["strengths", "clusters", "backtest", "lambdas", "simulation"])
+
+        team_stats, model = stages["clusters"]
+        log_loss, brier = stages["backtest"]
 
         print("\n=== BACKTEST RESULTS ===")
         print(f"Log Loss: {log_loss:.4f}")
         print(f"Brier Score: {brier:.4f}")
 
-
-        
         print("\n=== TEAM CLUSTERS ===")
         print(team_stats[["team", "cluster"]].head())
         numeric_cols = team_stats.select_dtypes(include=["float64", "int64"]).columns
         cluster_summary = team_stats.groupby("cluster")[numeric_cols].mean()
         print(cluster_summary)
 
+        lambdas = stages["lambdas"]
+        home_lambda = lambdas["home_lambda"]
+        away_lambda = lambdas["away_lambda"]
+
         print(f"\nExpected Goals:")
         print(f"{args.home}: {home_lambda:.2f}")
         print(f"{args.away}: {away_lambda:.2f}")
 
-        # Obtener clusters
-        home_cluster = team_stats[team_stats["team"] == args.home]["cluster"].values[0]
-        away_cluster = team_stats[team_stats["team"] == args.away]["cluster"].values[0]
-
         # Aplicar factor de matchup
-        matchup_factor = MATCHUP_MATRIX[home_cluster][away_cluster]
-
-        home_lambda *= matchup_factor
-        away_lambda *= matchup_factor
-
-
-        # Run Poisson simulation
-        results = monte_carlo_simulation(home_lambda, away_lambda)
+        home_lambda *= lambdas["matchup_factor"]
+        away_lambda *= lambdas["matchup_factor"]
 
+        results = stages["simulation"]
 
+        print(f"\nRecomputed stages: {', '.join(pipeline.executed) or 'none'}")
 
         print("\n=== PROBABILITIES ===")
         print(f"Home win: {results['home_win']:.2%}")
@@ -133,6 +196,17 @@ def main():
         print(f"Away win: {results['away_win']:.2%}")
         print(f"Over 2.5 goals: {results['over_2_5']:.2%}")
 
+        # Resto de mercados desde una única matriz de marcadores, con el
+        # mismo ruido en las lambdas que la simulación (coherentes con el 1X2)
+        markets = price_match(home_lambda, away_lambda, lambda_uncertainty=0.10)
+
+        print("\n=== MARKETS ===")
+        print(f"BTTS: {markets['btts']:.2%}")
+        print(f"1X: {markets['double_chance_1x']:.2%}")
+        print(f"X2: {markets['double_chance_x2']:.2%}")
+        for line, over in zip(markets["totals_lines"], markets["over"]):
+            print(f"Over {line}: {over:.2%}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+from ml.model import STRENGTH_COLUMNS, backtest_scores, calculate_strengths
+
+
+def bootstrap_counts(n, n_boot=2000, seed=None):
+    """
+    Resampling counts, shape (n_boot, n): how many times each match
+    appears in each bootstrap sample. Statistics become weighted sums,
+    so no resampled frame is ever built.
+    """
+    rng = np.random.default_rng(seed)
+
+    indices = rng.integers(0, n, size=(n_boot, n))
+    flat = indices + (np.arange(n_boot) * n)[:, None]
+
+    return np.bincount(flat.ravel(), minlength=n_boot * n).reshape(n_boot, n).astype(float)
+
+
+def _interval(estimate, replicates, alpha):
+    low, high = np.quantile(replicates, [alpha / 2, 1 - alpha / 2], axis=0)
+
+    return {
+        "estimate": estimate,
+        "low": low,
+        "high": high,
+        "std": replicates.std(axis=0, ddof=1),
+    }
+
+
+def bootstrap_mean(values, n_boot=2000, alpha=0.05, seed=None, counts=None):
+    """Percentile bootstrap interval for the mean of per-match values."""
+    values = np.asarray(values, dtype=float)
+
+    if counts is None:
+        counts = bootstrap_counts(len(values), n_boot, seed)
+
+    replicates = counts @ values / len(values)
+
+    return _interval(values.mean(), replicates, alpha)
+
+
+def bootstrap_backtest(df, team_stats, league_home_xg_avg, league_away_xg_avg, matchup_matrix,
+                       n_boot=2000, alpha=0.05, seed=None):
+    """
+    Confidence intervals for the backtest log loss and Brier score.
+
+    Returns dict with "log_loss" and "brier", each holding estimate,
+    low, high and std.
+    """
+    log_losses, brier_scores, _ = backtest_scores(
+        df, team_stats, league_home_xg_avg, league_away_xg_avg, matchup_matrix
+    )
+
+    counts = bootstrap_counts(len(log_losses), n_boot, seed)
+
+    return {
+        "log_loss": bootstrap_mean(log_losses, alpha=alpha, counts=counts),
+        "brier": bootstrap_mean(brier_scores, alpha=alpha, counts=counts),
+    }
+
+
+def compare_configurations(df, config_a, config_b, n_boot=2000, alpha=0.05, seed=None):
+    """
+    Paired bootstrap comparison of two model configurations.
+
+    Each config is a dict with team_stats, league_home_xg_avg,
+    league_away_xg_avg and matchup_matrix. Both are scored on the same
+    matches and the same resamples, so the interval is for the
+    difference B - A (negative means B is better).
+
+    Returns dict per metric with estimate, low, high, std and
+    prob_b_better (share of resamples where B has the lower loss).
+    """
+    scores_a = backtest_scores(df, **config_a)
+    scores_b = backtest_scores(df, **config_b)
+
+    # Solo los partidos que ambas configuraciones pueden puntuar
+    common, rows_a, rows_b = np.intersect1d(scores_a[2], scores_b[2], return_indices=True)
+
+    counts = bootstrap_counts(len(common), n_boot, seed)
+
+    comparison = {}
+    for k, metric in enumerate(["log_loss", "brier"]):
+        difference = scores_b[k][rows_b] - scores_a[k][rows_a]
+        replicates = counts @ difference / len(difference)
+
+        comparison[metric] = _interval(difference.mean(), replicates, alpha)
+        comparison[metric]["prob_b_better"] = float(np.mean(replicates < 0))
+
+    comparison["n_matches"] = len(common)
+
+    return comparison
+
+
+def bootstrap_strengths(df, decay_factor=0.015, n_boot=2000, alpha=0.05, seed=None):
+    """
+    Confidence intervals for every team's strength columns.
+
+    Reproduces calculate_strengths on each resample with matrix products:
+    resampling counts multiply the recency weights, and per-team weighted
+    averages come from products with one-hot team matrices.
+
+    Returns a DataFrame with team, column, estimate, low, high and std.
+    """
+    strengths, _, _ = calculate_strengths(df, decay_factor)
+    teams = strengths["team"].to_numpy()
+    team_index = pd.Index(teams)
+
+    dates = pd.to_datetime(df["date"]).to_numpy()
+    days_ago = (dates.max() - dates) / np.timedelta64(1, "D")
+    recency = np.exp(-decay_factor * np.floor(days_ago))
+
+    home_xg = df["home_xg"].to_numpy(dtype=float)
+    away_xg = df["away_xg"].to_numpy(dtype=float)
+    home_deep = df["home_deep_completions"].to_numpy(dtype=float)
+    away_deep = df["away_deep_completions"].to_numpy(dtype=float)
+
+    n = len(df)
+    home_onehot = np.zeros((n, len(teams)))
+    away_onehot = np.zeros((n, len(teams)))
+    home_onehot[np.arange(n), team_index.get_indexer(df["home_team"])] = 1.0
+    away_onehot[np.arange(n), team_index.get_indexer(df["away_team"])] = 1.0
+
+    weights = bootstrap_counts(n, n_boot, seed) * recency
+
+    league_home = (weights @ home_xg) / weights.sum(axis=1)
+    league_away = (weights @ away_xg) / weights.sum(axis=1)
+
+    def team_average(values, onehot):
+        total = weights @ onehot
+        with np.errstate(invalid="ignore", divide="ignore"):
+            average = ((weights * values) @ onehot) / total
+        # Igual que calculate_strengths: 0 si el equipo no tiene partidos
+        return np.where(total > 0, average, 0.0)
+
+    replicates = {
+        "home_attack_strength":
+            team_average(home_xg, home_onehot) / league_home[:, None]
+            * (1 + team_average(home_deep, home_onehot) * 0.005),
+        "home_defense_strength":
+            team_average(away_xg, home_onehot) / league_away[:, None],
+        "away_attack_strength":
+            team_average(away_xg, away_onehot) / league_away[:, None]
+            * (1 + team_average(away_deep, away_onehot) * 0.005),
+        "away_defense_strength":
+            team_average(home_xg, away_onehot) / league_home[:, None],
+    }
+
+    rows = []
+    for column in STRENGTH_COLUMNS:
+        interval = _interval(strengths[column].to_numpy(), replicates[column], alpha)
+        rows.append(pd.DataFrame({
+            "team": teams,
+            "column": column,
+            "estimate": interval["estimate"],
+            "low": interval["low"],
+            "high": interval["high"],
+            "std": interval["std"],
+        }))
+
+    return pd.concat(rows, ignore_index=True)
@@ -0,0 +1,156 @@
+import numpy as np
+
+from ml.markets import (
+    DEFAULT_TOTALS_LINES, goal_difference_distribution, score_matrix, total_goals_distribution
+)
+
+
+MATCH_MINUTES = 90
+
+# Efecto por tarjeta roja: (ataque del equipo con uno menos, ataque del rival)
+RED_CARD_EFFECT = (0.67, 1.25)
+
+
+def goal_time_profile(n_minutes=MATCH_MINUTES, slope=0.4,
+                      first_half_stoppage=1.5, second_half_stoppage=3.0):
+    """
+    Share of a match's goals expected in each minute, shape (n_minutes,),
+    summing to 1.
+
+    Intensity grows linearly over the match (slope = relative increase
+    from kickoff to full time), and minutes 45 and 90 also carry their
+    expected stoppage time (in minutes).
+    """
+    minutes = np.arange(n_minutes)
+    intensity = 1 + slope * (minutes / (n_minutes - 1) - 0.5)
+
+    intensity[n_minutes // 2 - 1] *= 1 + first_half_stoppage
+    intensity[-1] *= 1 + second_half_stoppage
+
+    return intensity / intensity.sum()
+
+
+def remaining_share(profile, minute):
+    """Share of the match's goal intensity still to come after `minute` minutes."""
+    # remaining[m] = Σ profile[m:], con remaining[n_minutes] = 0
+    remaining = np.concatenate([np.cumsum(profile[::-1])[::-1], [0.0]])
+    minute = np.clip(np.asarray(minute, dtype=int), 0, len(profile))
+
+    return remaining[minute]
+
+
+def remaining_lambdas(home_lambda, away_lambda, minute, home_reds=0, away_reds=0,
+                      profile=None, red_card_effect=RED_CARD_EFFECT):
+    """
+    Expected remaining goals for each side, given the minute and the red
+    cards shown so far (assumed to apply for the rest of the match).
+    """
+    if profile is None:
+        profile = goal_time_profile()
+
+    share = remaining_share(profile, minute)
+    own, opponent = red_card_effect
+
+    home_factor = own ** np.asarray(home_reds) * opponent ** np.asarray(away_reds)
+    away_factor = own ** np.asarray(away_reds) * opponent ** np.asarray(home_reds)
+
+    return home_lambda * share * home_factor, away_lambda * share * away_factor
+
+
+class InPlayGrid:
+    """
+    In-play 1X2 and totals probabilities precomputed at kickoff.
+
+    Holds, for every elapsed minute and red-card state, the probability
+    of each final result given the current goal margin, and of each over
+    line given the current total. Live updates are array lookups.
+
+    - result: (minute, home_reds, away_reds, margin, 3) for
+      home_win / draw / away_win, margin from -max_margin to max_margin
+    - over: (minute, home_reds, away_reds, total, n_lines)
+    """
+
+    def __init__(self, home_lambda, away_lambda,
+                 profile=None,
+                 totals_lines=DEFAULT_TOTALS_LINES,
+                 max_goals=10,
+                 max_margin=5,
+                 max_reds=2,
+                 red_card_effect=RED_CARD_EFFECT):
+        self.home_lambda = home_lambda
+        self.away_lambda = away_lambda
+        self.profile = goal_time_profile() if profile is None else np.asarray(profile, dtype=float)
+        self.totals_lines = np.asarray(totals_lines, dtype=float)
+        self.max_margin = max_margin
+        self.max_reds = max_reds
+        self.red_card_effect = red_card_effect
+
+        # Con un total actual mayor que la línea más alta el over ya está ganado
+        self.max_total = int(np.floor(self.totals_lines.max())) + 1
+
+        n_minutes = len(self.profile) + 1
+        reds = np.arange(max_reds + 1)
+        minute_grid, home_reds, away_reds = np.meshgrid(
+            np.arange(n_minutes), reds, reds, indexing="ij"
+        )
+
+        home_remaining, away_remaining = remaining_lambdas(
+            home_lambda, away_lambda, minute_grid.ravel(), home_reds.ravel(), away_reds.ravel(),
+            self.profile, red_card_effect
+        )
+        self.home_remaining = home_remaining.reshape(minute_grid.shape)
+        self.away_remaining = away_remaining.reshape(minute_grid.shape)
+
+        matrices = score_matrix(home_remaining, away_remaining, max_goals)
+        shape = minute_grid.shape
+
+        self.result = self._result_grid(matrices).reshape(shape + (2 * max_margin + 1, 3))
+        self.over = self._over_grid(matrices).reshape(shape + (self.max_total + 1, len(self.totals_lines)))
+
+    def _result_grid(self, matrices):
+        # P(final) = P(diferencia restante d) con margen actual m: gana local si m + d > 0
+        dist, differences = goal_difference_distribution(matrices)
+        margins = np.arange(-self.max_margin, self.max_margin + 1)
+        final = margins[:, None] + differences[None, :]
+
+        weights = np.stack([final > 0, final == 0, final < 0], axis=-1).astype(float)
+
+        return np.einsum("nd,mdo->nmo", dist, weights)
+
+    def _over_grid(self, matrices):
+        dist, remaining_totals = total_goals_distribution(matrices)
+        current = np.arange(self.max_total + 1)
+        final = current[:, None] + remaining_totals[None, :]
+
+        weights = (final[:, :, None] > self.totals_lines[None, None, :]).astype(float)
+
+        return np.einsum("nt,ctl->ncl", dist, weights)
+
+    def lookup(self, minute, home_goals, away_goals, home_reds=0, away_reds=0):
+        """
+        Live probabilities for a match state (scalars or arrays).
+
+        Returns dict with home_win, draw, away_win, over (..., n_lines),
+        totals_lines and the remaining lambdas.
+        """
+        minute = np.clip(np.asarray(minute, dtype=int), 0, len(self.profile))
+        home_reds = np.clip(np.asarray(home_reds, dtype=int), 0, self.max_reds)
+        away_reds = np.clip(np.asarray(away_reds, dtype=int), 0, self.max_reds)
+
+        home_goals = np.asarray(home_goals, dtype=int)
+        away_goals = np.asarray(away_goals, dtype=int)
+
+        margin = np.clip(home_goals - away_goals, -self.max_margin, self.max_margin) + self.max_margin
+        total = np.clip(home_goals + away_goals, 0, self.max_total)
+
+        result = self.result[minute, home_reds, away_reds, margin]
+
+        return {
+            "home_win": result[..., 0],
+            "draw": result[..., 1],
+            "away_win": result[..., 2],
+            "totals_lines": self.totals_lines,
+            "over": self.over[minute, home_reds, away_reds, total],
+            "home_remaining_lambda": self.home_remaining[minute, home_reds, away_reds],
+            "away_remaining_lambda": self.away_remaining[minute, home_reds, away_reds],
+        }
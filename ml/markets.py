@@ -0,0 +1,397 @@
+import numpy as np
+from scipy.stats import poisson
+
+
+DEFAULT_TOTALS_LINES = (0.5, 1.5, 2.5, 3.5, 4.5, 5.5)
+DEFAULT_HANDICAP_LINES = (-2.5, -2.0, -1.75, -1.5, -1.25, -1.0, -0.75, -0.5,
+                          -0.25, 0.0, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5)
+
+
+def goal_probabilities(lambdas, max_goals=10, lambda_uncertainty=0.0, n_nodes=32):
+    """
+    Goal pmf P(goals=k) for k in [0, max_goals], shape (n, max_goals+1).
+
+    With lambda_uncertainty > 0 the Poisson rate is integrated over the
+    same Normal(λ, λ·uncertainty) noise (clipped at 0.01) that
+    monte_carlo_simulation samples, using Gauss-Hermite quadrature.
+    """
+    lambdas = np.atleast_1d(np.asarray(lambdas, dtype=float))
+    goals = np.arange(max_goals + 1)
+
+    if lambda_uncertainty <= 0:
+        return poisson.pmf(goals[None, :], lambdas[:, None])
+
+    nodes, weights = np.polynomial.hermite.hermgauss(n_nodes)
+    weights = weights / np.sqrt(np.pi)
+
+    # (n, n_nodes): λ' = λ + sqrt(2)·σ·x
+    sigma = lambdas * lambda_uncertainty
+    noisy = np.maximum(lambdas[:, None] + np.sqrt(2) * sigma[:, None] * nodes[None, :], 0.01)
+
+    pmf = poisson.pmf(goals[None, None, :], noisy[:, :, None])
+
+    return np.einsum("q,nqk->nk", weights, pmf)
+
+
+def goal_probability_derivatives(lambdas, max_goals=10, lambda_uncertainty=0.0, n_nodes=32):
+    """
+    d/dλ of goal_probabilities, same shape.
+
+    Uses dPois(k; λ)/dλ = Pois(k-1; λ) - Pois(k; λ); with uncertainty the
+    derivative goes inside the Gauss-Hermite sum through the chain rule
+    (zero on nodes clipped at 0.01).
+    """
+    lambdas = np.atleast_1d(np.asarray(lambdas, dtype=float))
+    goals = np.arange(max_goals + 1)
+
+    if lambda_uncertainty <= 0:
+        lambdas = lambdas[:, None]
+        return poisson.pmf(goals[None, :] - 1, lambdas) - poisson.pmf(goals[None, :], lambdas)
+
+    nodes, weights = np.polynomial.hermite.hermgauss(n_nodes)
+    weights = weights / np.sqrt(np.pi)
+
+    # λ' = λ·(1 + sqrt(2)·uncertainty·x)  =>  dλ'/dλ = 1 + sqrt(2)·uncertainty·x
+    scale = 1 + np.sqrt(2) * lambda_uncertainty * nodes
+    raw = lambdas[:, None] * scale[None, :]
+    noisy = np.maximum(raw, 0.01)
+    chain = np.where(raw > 0.01, scale[None, :], 0.0)
+
+    derivative = (
+        poisson.pmf(goals[None, None, :] - 1, noisy[:, :, None]) -
+        poisson.pmf(goals[None, None, :], noisy[:, :, None])
+    )
+
+    return np.einsum("q,nq,nqk->nk", weights, chain, derivative)
+
+
+def score_matrix(home_lambda, away_lambda, max_goals=10, lambda_uncertainty=0.0):
+    """
+    Score-probability matrix P(home_goals=i, away_goals=j).
+
+    Scalar lambdas give a (max_goals+1, max_goals+1) matrix, arrays of
+    lambdas give a (n_matches, max_goals+1, max_goals+1) batch.
+    The truncated tail is redistributed by renormalising each matrix.
+    """
+    home_lambda = np.asarray(home_lambda, dtype=float)
+    away_lambda = np.asarray(away_lambda, dtype=float)
+    scalar = home_lambda.ndim == 0 and away_lambda.ndim == 0
+
+    home_lambda, away_lambda = np.broadcast_arrays(
+        np.atleast_1d(home_lambda), np.atleast_1d(away_lambda)
+    )
+
+    home_probs = goal_probabilities(home_lambda, max_goals, lambda_uncertainty)
+    away_probs = goal_probabilities(away_lambda, max_goals, lambda_uncertainty)
+
+    matrices = home_probs[:, :, None] * away_probs[:, None, :]
+    matrices /= matrices.sum(axis=(1, 2), keepdims=True)
+
+    return matrices[0] if scalar else matrices
+
+
+def score_matrix_derivatives(home_lambdas, away_lambdas, max_goals=10, lambda_uncertainty=0.0):
+    """
+    Batch of score matrices and their derivatives with respect to each
+    lambda, all of shape (n_matches, G, G).
+
+    Includes the renormalisation of score_matrix. Every market reduction
+    is linear in the matrix, so applying it to a derivative matrix gives
+    the derivative of that market.
+
+    Returns (matrices, d_home_lambda, d_away_lambda).
+    """
+    home_lambdas, away_lambdas = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(home_lambdas, dtype=float)),
+        np.atleast_1d(np.asarray(away_lambdas, dtype=float))
+    )
+
+    home_probs = goal_probabilities(home_lambdas, max_goals, lambda_uncertainty)
+    away_probs = goal_probabilities(away_lambdas, max_goals, lambda_uncertainty)
+    home_derivs = goal_probability_derivatives(home_lambdas, max_goals, lambda_uncertainty)
+    away_derivs = goal_probability_derivatives(away_lambdas, max_goals, lambda_uncertainty)
+
+    raw = home_probs[:, :, None] * away_probs[:, None, :]
+    mass = raw.sum(axis=(1, 2), keepdims=True)
+    matrices = raw / mass
+
+    # d(A/s) = dA/s - (A/s)·(ds/s)
+    d_home = home_derivs[:, :, None] * away_probs[:, None, :]
+    d_home = (d_home - matrices * d_home.sum(axis=(1, 2), keepdims=True)) / mass
+
+    d_away = home_probs[:, :, None] * away_derivs[:, None, :]
+    d_away = (d_away - matrices * d_away.sum(axis=(1, 2), keepdims=True)) / mass
+
+    return matrices, d_home, d_away
+
+
+class ScoreMatrixCache:
+    """
+    Cache of score matrices keyed by the rounded (λh, λa) pair.
+
+    Matches with (almost) the same lambdas share one matrix, so pricing a
+    whole matchday or a backtest only builds each distinct matrix once.
+    """
+
+    def __init__(self, max_goals=10, decimals=3, max_size=100000, lambda_uncertainty=0.0):
+        self.max_goals = max_goals
+        self.lambda_uncertainty = lambda_uncertainty
+        self.decimals = decimals
+        self.max_size = max_size
+        self._matrices = {}
+
+    def __len__(self):
+        return len(self._matrices)
+
+    def clear(self):
+        self._matrices.clear()
+
+    def get(self, home_lambdas, away_lambdas):
+        """Return the (n_matches, G, G) batch for the given lambdas."""
+        home_lambdas = np.round(np.atleast_1d(np.asarray(home_lambdas, dtype=float)), self.decimals)
+        away_lambdas = np.round(np.atleast_1d(np.asarray(away_lambdas, dtype=float)), self.decimals)
+        home_lambdas, away_lambdas = np.broadcast_arrays(home_lambdas, away_lambdas)
+
+        pairs = np.stack([home_lambdas, away_lambdas], axis=1)
+        unique_pairs, inverse = np.unique(pairs, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+        # Construir de una vez solo las matrices que faltan
+        keys = [(float(h), float(a)) for h, a in unique_pairs]
+        missing = [i for i, key in enumerate(keys) if key not in self._matrices]
+
+        if missing:
+            if len(self._matrices) + len(missing) > self.max_size:
+                self._matrices.clear()
+
+            new = score_matrix(
+                unique_pairs[missing, 0],
+                unique_pairs[missing, 1],
+                self.max_goals,
+                self.lambda_uncertainty
+            )
+            for i, matrix in zip(missing, new):
+                self._matrices[keys[i]] = matrix
+
+        unique_matrices = np.stack([self._matrices[key] for key in keys])
+
+        return unique_matrices[inverse]
+
+
+# ==================== REDUCCIONES ====================
+
+def _as_batch(matrices):
+    matrices = np.asarray(matrices, dtype=float)
+    if matrices.ndim == 2:
+        return matrices[None], True
+    return matrices, False
+
+
+def _goal_grids(size):
+    goals = np.arange(size)
+    return goals[:, None], goals[None, :]
+
+
+def goal_difference_distribution(matrices):
+    """
+    P(home_goals - away_goals = d) for d in [-G+1, G-1].
+
+    Returns (probabilities, differences).
+    """
+    matrices, scalar = _as_batch(matrices)
+    size = matrices.shape[-1]
+    home, away = _goal_grids(size)
+
+    # Matriz one-hot (G*G, 2G-1): cada celda suma en su diferencia
+    diff_index = (home - away + size - 1).ravel()
+    one_hot = np.zeros((size * size, 2 * size - 1))
+    one_hot[np.arange(size * size), diff_index] = 1.0
+
+    dist = matrices.reshape(len(matrices), -1) @ one_hot
+    differences = np.arange(-size + 1, size)
+
+    return (dist[0] if scalar else dist), differences
+
+
+def total_goals_distribution(matrices):
+    """
+    P(home_goals + away_goals = t) for t in [0, 2G-2].
+
+    Returns (probabilities, totals).
+    """
+    matrices, scalar = _as_batch(matrices)
+    size = matrices.shape[-1]
+    home, away = _goal_grids(size)
+
+    total_index = (home + away).ravel()
+    one_hot = np.zeros((size * size, 2 * size - 1))
+    one_hot[np.arange(size * size), total_index] = 1.0
+
+    dist = matrices.reshape(len(matrices), -1) @ one_hot
+    totals = np.arange(2 * size - 1)
+
+    return (dist[0] if scalar else dist), totals
+
+
+def match_result(matrices):
+    """1X2 probabilities: (home_win, draw, away_win)."""
+    dist, differences = goal_difference_distribution(matrices)
+
+    home_win = dist[..., differences > 0].sum(axis=-1)
+    draw = dist[..., differences == 0].sum(axis=-1)
+    away_win = dist[..., differences < 0].sum(axis=-1)
+
+    return home_win, draw, away_win
+
+
+def double_chance(matrices):
+    """Double chance probabilities: (1X, X2, 12)."""
+    home_win, draw, away_win = match_result(matrices)
+
+    return home_win + draw, draw + away_win, home_win + away_win
+
+
+def both_teams_to_score(matrices):
+    """P(both teams score)."""
+    matrices, scalar = _as_batch(matrices)
+
+    home_blank = matrices[:, 0, :].sum(axis=-1)
+    away_blank = matrices[:, :, 0].sum(axis=-1)
+    btts = 1 - home_blank - away_blank + matrices[:, 0, 0]
+
+    return btts[0] if scalar else btts
+
+
+def totals(matrices, lines=DEFAULT_TOTALS_LINES):
+    """
+    Over probabilities for each totals line, shape (..., n_lines).
+
+    Whole lines (e.g. 2.0) return P(total > line); the push is
+    P(total == line) and can be read from total_goals_distribution.
+    """
+    dist, total_goals = total_goals_distribution(matrices)
+    lines = np.asarray(lines, dtype=float)
+
+    over_mask = total_goals[:, None] > lines[None, :]
+
+    return dist @ over_mask
+
+
+def _handicap_components(line):
+    # Las líneas de cuarto (-0.25, -0.75...) se reparten entre dos líneas
+    if (line * 4) % 2 == 1:
+        return (line - 0.25, line + 0.25)
+    return (line,)
+
+
+def asian_handicap(matrices, lines=DEFAULT_HANDICAP_LINES):
+    """
+    Asian handicap outcome probabilities from the home side's perspective.
+
+    A line of -1.0 means the home team starts one goal down. Quarter lines
+    split the stake over the two neighbouring lines, so the returned values
+    are stake-weighted.
+
+    Returns dict with "home", "push" and "away" arrays of shape (..., n_lines).
+    """
+    dist, differences = goal_difference_distribution(matrices)
+    lines = [float(line) for line in lines]
+
+    home_weights = np.zeros((len(differences), len(lines)))
+    push_weights = np.zeros((len(differences), len(lines)))
+    away_weights = np.zeros((len(differences), len(lines)))
+
+    for k, line in enumerate(lines):
+        components = _handicap_components(line)
+        for component in components:
+            adjusted = differences + component
+            home_weights[:, k] += (adjusted > 0) / len(components)
+            push_weights[:, k] += (adjusted == 0) / len(components)
+            away_weights[:, k] += (adjusted < 0) / len(components)
+
+    return {
+        "lines": np.asarray(lines),
+        "home": dist @ home_weights,
+        "push": dist @ push_weights,
+        "away": dist @ away_weights,
+    }
+
+
+def correct_scores(matrices, max_score=5):
+    """
+    Correct score probabilities up to max_score goals per side.
+
+    Returns (scores, other) where scores has shape (..., max_score+1,
+    max_score+1) and other is the probability of any larger score.
+    """
+    matrices, scalar = _as_batch(matrices)
+
+    scores = matrices[:, :max_score + 1, :max_score + 1]
+    other = 1 - scores.sum(axis=(1, 2))
+
+    if scalar:
+        return scores[0], other[0]
+    return scores, other
+
+
+def _totals_push(matrices, lines):
+    dist, total_goals = total_goals_distribution(matrices)
+    lines = np.asarray(lines, dtype=float)
+
+    return dist @ (total_goals[:, None] == lines[None, :])
+
+
+def price_markets(matrices,
+                  totals_lines=DEFAULT_TOTALS_LINES,
+                  handicap_lines=DEFAULT_HANDICAP_LINES,
+                  max_correct_score=5):
+    """
+    Every market derived from one score matrix (or a batch of them).
+
+    Keys home_win, draw, away_win and over_2_5 match the output of
+    monte_carlo_simulation.
+    """
+    home_win, draw, away_win = match_result(matrices)
+    dc_home_draw, dc_draw_away, dc_home_away = double_chance(matrices)
+    over = totals(matrices, totals_lines)
+    scores, other_score = correct_scores(matrices, max_correct_score)
+
+    markets = {
+        "home_win": home_win,
+        "draw": draw,
+        "away_win": away_win,
+        "double_chance_1x": dc_home_draw,
+        "double_chance_x2": dc_draw_away,
+        "double_chance_12": dc_home_away,
+        "btts": both_teams_to_score(matrices),
+        "totals_lines": np.asarray(totals_lines, dtype=float),
+        "over": over,
+        "under": 1 - over - _totals_push(matrices, totals_lines),
+        "asian_handicap": asian_handicap(matrices, handicap_lines),
+        "correct_score": scores,
+        "correct_score_other": other_score,
+    }
+
+    if 2.5 in totals_lines:
+        markets["over_2_5"] = over[..., list(totals_lines).index(2.5)]
+
+    return markets
+
+
+def price_match(home_lambda, away_lambda, max_goals=10, lambda_uncertainty=0.0, **kwargs):
+    """Price every market for a single match from its lambdas."""
+    matrix = score_matrix(home_lambda, away_lambda, max_goals, lambda_uncertainty)
+    return price_markets(matrix, **kwargs)
+
+
+def price_matches(home_lambdas, away_lambdas, cache=None, **kwargs):
+    """
+    Price every market for a batch of matches.
+
+    Matrices come from a ScoreMatrixCache (a fresh one if none is given),
+    so repeated lambda pairs are only built once.
+    """
+    if cache is None:
+        cache = ScoreMatrixCache()
+
+    return price_markets(cache.get(home_lambdas, away_lambdas), **kwargs)
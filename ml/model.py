@@ -1,112 +1,134 @@
 import pandas as pd
 import numpy as np
 
+from ml.markets import score_matrix, match_result
+
+
+# Columnas de fuerza de team_stats (calculate_strengths y XGRatingEngine)
+STRENGTH_COLUMNS = [
+    "home_attack_strength",
+    "home_defense_strength",
+    "away_attack_strength",
+    "away_defense_strength",
+]
+
+
+def _match_keys(df):
+    """
+    Dates and integer team codes of a match table.
+
+    Works on a DataFrame or on a MatchArrays view (data/shared_arrays.py),
+    whose team codes are used as they are.
+    """
+
+    if hasattr(df, "team_names"):
+        return (
+            np.asarray(df["date"]).astype("datetime64[ns]"),
+            np.asarray(df["home_id"]),
+            np.asarray(df["away_id"]),
+            np.asarray(df.team_names, dtype=object),
+        )
+
+    codes, teams = pd.factorize(
+        np.concatenate([df["home_team"].to_numpy(), df["away_team"].to_numpy()])
+    )
+
+    return (
+        pd.to_datetime(df["date"]).to_numpy(),
+        codes[:len(df)],
+        codes[len(df):],
+        np.asarray(teams, dtype=object),
+    )
+
+
 def calculate_strengths(df, decay_factor=0.015):
     """
     Calculate home/away strengths using:
     - xG
     - Recency weighting
     - Deep completions adjustment
-    """
 
-    df = df.copy()
+    df can be a DataFrame or a MatchArrays view.
+    """
 
-    # Convertir fecha si no lo está
-    df["date"] = pd.to_datetime(df["date"])
+    dates, home_codes, away_codes, team_names = _match_keys(df)
 
-    # Ordenar por fecha
-    df = df.sort_values("date")
+    home_xg = np.asarray(df["home_xg"], dtype=float)
+    away_xg = np.asarray(df["away_xg"], dtype=float)
+    home_deep = np.asarray(df["home_deep_completions"], dtype=float)
+    away_deep = np.asarray(df["away_deep_completions"], dtype=float)
 
     # Calcular peso por recencia
-    most_recent_date = df["date"].max()
-    df["days_ago"] = (most_recent_date - df["date"]).dt.days
-    df["weight"] = np.exp(-decay_factor * df["days_ago"])
+    days_ago = (dates.max() - dates) // np.timedelta64(1, "D")
+    weight = np.exp(-decay_factor * days_ago)
 
     # Promedios ponderados liga
-    league_home_xg_avg = np.average(df["home_xg"], weights=df["weight"])
-    league_away_xg_avg = np.average(df["away_xg"], weights=df["weight"])
+    league_home_xg_avg = np.average(home_xg, weights=weight)
+    league_away_xg_avg = np.average(away_xg, weights=weight)
 
     #league_home_shots_avg = np.average(df["home_shots"], weights=df["weight"])
     #league_away_shots_avg = np.average(df["away_shots"], weights=df["weight"])
 
+    # Equipos en orden de aparición por fecha
+    order = np.argsort(dates, kind="quicksort")
+    appearances = np.stack([home_codes[order], away_codes[order]], axis=1).ravel()
+    codes, first_seen = np.unique(appearances, return_index=True)
+    team_codes = codes[np.argsort(first_seen)]
 
-    teams = pd.unique(df[["home_team", "away_team"]].values.ravel())
-
-    data = []
-
-    for team in teams:
+    n_teams = len(team_names)
 
-        home_matches = df[df["home_team"] == team]
-        away_matches = df[df["away_team"] == team]
+    def weighted_average(values, team_of_match):
+        # Promedio ponderado por equipo; 0 si no tiene partidos
+        total = np.bincount(team_of_match, weights=weight, minlength=n_teams)
+        weighted = np.bincount(team_of_match, weights=weight * values, minlength=n_teams)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            average = weighted / total
+        return np.where(total > 0, average, 0)[team_codes]
 
-        # Promedios ponderados xG
-        home_attack_xg = np.average(
-            home_matches["home_xg"],
-            weights=home_matches["weight"]
-        ) if len(home_matches) > 0 else 0
+    # Promedios ponderados xG
+    home_attack_xg = weighted_average(home_xg, home_codes)
+    away_attack_xg = weighted_average(away_xg, away_codes)
+    home_defense_xg = weighted_average(away_xg, home_codes)
+    away_defense_xg = weighted_average(home_xg, away_codes)
 
-        away_attack_xg = np.average(
-            away_matches["away_xg"],
-            weights=away_matches["weight"]
-        ) if len(away_matches) > 0 else 0
+    # Deep completions adjustment
+    home_deep = weighted_average(home_deep, home_codes)
+    away_deep = weighted_average(away_deep, away_codes)
 
-        home_defense_xg = np.average(
-            home_matches["away_xg"],
-            weights=home_matches["weight"]
-        ) if len(home_matches) > 0 else 0
-
-        away_defense_xg = np.average(
-            away_matches["home_xg"],
-            weights=away_matches["weight"]
-        ) if len(away_matches) > 0 else 0
-
-        # Deep completions adjustment
-        home_deep = np.average(
-            home_matches["home_deep_completions"],
-            weights=home_matches["weight"]
-        ) if len(home_matches) > 0 else 0
-
-        away_deep = np.average(
-            away_matches["away_deep_completions"],
-            weights=away_matches["weight"]
-        ) if len(away_matches) > 0 else 0
-
-        """
-        # Shots ponderados
-        home_shots = np.average(
-            #home_matches["home_shots"],
-            weights=home_matches["weight"]
-        ) if len(home_matches) > 0 else 0
-
-        away_shots = np.average(
-            #away_matches["away_shots"],
-            weights=away_matches["weight"]
-        ) if len(away_matches) > 0 else 0
+    """
+    # Shots ponderados
+    home_shots = weighted_average(
+        #np.asarray(df["home_shots"], dtype=float),
+        home_codes
+    )
 
-        #home_shot_factor = home_shots / league_home_shots_avg if league_home_shots_avg > 0 else 1
-        #away_shot_factor = away_shots / league_away_shots_avg if league_away_shots_avg > 0 else 1
-        """
+    away_shots = weighted_average(
+        #np.asarray(df["away_shots"], dtype=float),
+        away_codes
+    )
 
-        data.append({
-            "team": team,
-            "home_attack_strength":
-                (home_attack_xg / league_home_xg_avg) *
-                (1 + home_deep * 0.005),
-                #*(1 + (home_shot_factor - 1) * 0.2),
+    #home_shot_factor = np.where(league_home_shots_avg > 0, home_shots / league_home_shots_avg, 1)
+    #away_shot_factor = np.where(league_away_shots_avg > 0, away_shots / league_away_shots_avg, 1)
+    """
 
-            "home_defense_strength":
-                home_defense_xg / league_away_xg_avg,
+    strengths = pd.DataFrame({
+        "team": team_names[team_codes],
+        "home_attack_strength":
+            (home_attack_xg / league_home_xg_avg) *
+            (1 + home_deep * 0.005),
+            #*(1 + (home_shot_factor - 1) * 0.2),
 
-            "away_attack_strength":
-                (away_attack_xg / league_away_xg_avg) *
-                (1 + away_deep * 0.005),
-                #*(1 + (away_shot_factor - 1) * 0.2),
+        "home_defense_strength":
+            home_defense_xg / league_away_xg_avg,
 
-            "away_defense_strength":
-                away_defense_xg / league_home_xg_avg,
-        })
+        "away_attack_strength":
+            (away_attack_xg / league_away_xg_avg) *
+            (1 + away_deep * 0.005),
+            #*(1 + (away_shot_factor - 1) * 0.2),
 
-    strengths = pd.DataFrame(data)
+        "away_defense_strength":
+            away_defense_xg / league_home_xg_avg,
+    })
 
     return strengths, league_home_xg_avg, league_away_xg_avg
 
@@ -133,89 +155,121 @@ def calculate_lambdas(home_team, away_team,
 
     return lambda_home, lambda_away
 
-def backtest_model(df, team_stats, league_home_xg_avg, league_away_xg_avg, matchup_matrix):
-    
-    log_losses = []
-    brier_scores = []
-    
-    for _, row in df.iterrows():
-        
-        home = row["home_team"]
-        away = row["away_team"]
-        
-        # Saltar si no tenemos stats del equipo
-        if home not in team_stats["team"].values:
-            continue
-        if away not in team_stats["team"].values:
-            continue
-        
-        # === Calcular lambdas base (usa tu misma lógica aquí) ===
-        
-        home_lambda = (
-            team_stats.loc[team_stats["team"] == home, "home_attack_strength"].values[0] *
-            team_stats.loc[team_stats["team"] == away, "away_defense_strength"].values[0] *
-            league_home_xg_avg
-        )
-        
-        away_lambda = (
-            team_stats.loc[team_stats["team"] == away, "away_attack_strength"].values[0] *
-            team_stats.loc[team_stats["team"] == home, "home_defense_strength"].values[0] *
-            league_away_xg_avg
+def matchup_factor_array(matchup_matrix, size=0):
+    """
+    Matchup dict {home_cluster: {away_cluster: factor}} as a square array
+    covering every cluster on either side, and at least size clusters
+    (1 where no factor is given).
+    """
+    away_max = max((max(row) for row in matchup_matrix.values() if row), default=0)
+    size = max(size, max(matchup_matrix, default=0) + 1, away_max + 1)
+    factors = np.ones((size, size))
+    for i, row in matchup_matrix.items():
+        for j, factor in row.items():
+            factors[i, j] = factor
+
+    return factors
+
+
+def _matchup_factors(matchup_matrix, home_clusters, away_clusters):
+    size = max(np.max(home_clusters, initial=0), np.max(away_clusters, initial=0)) + 1
+    return matchup_factor_array(matchup_matrix, size)[home_clusters, away_clusters]
+
+
+def calculate_match_lambdas(df, team_stats,
+                            league_home_xg_avg,
+                            league_away_xg_avg,
+                            matchup_matrix=None):
+    """
+    Vectorised calculate_lambdas for a table of matches (DataFrame or
+    MatchArrays view), with the matchup factor applied when
+    matchup_matrix is given.
+
+    Returns (home_lambdas, away_lambdas, known), where known marks the
+    matches whose two teams are in team_stats; lambdas are only
+    returned for those.
+    """
+
+    stats = team_stats.set_index("team")
+
+    home_teams = np.asarray(df["home_team"])
+    away_teams = np.asarray(df["away_team"])
+
+    known = np.isin(home_teams, stats.index) & np.isin(away_teams, stats.index)
+
+    home = stats.loc[home_teams[known]]
+    away = stats.loc[away_teams[known]]
+
+    home_lambda = (
+        home["home_attack_strength"].to_numpy() *
+        away["away_defense_strength"].to_numpy() *
+        league_home_xg_avg
+    )
+
+    away_lambda = (
+        away["away_attack_strength"].to_numpy() *
+        home["home_defense_strength"].to_numpy() *
+        league_away_xg_avg
+    )
+
+    if matchup_matrix is not None:
+        factor = _matchup_factors(
+            matchup_matrix,
+            home["cluster"].to_numpy(),
+            away["cluster"].to_numpy()
         )
-        
-        # === Aplicar matchup ===
-        
-        home_cluster = team_stats.loc[team_stats["team"] == home, "cluster"].values[0]
-        away_cluster = team_stats.loc[team_stats["team"] == away, "cluster"].values[0]
-        
-        factor = matchup_matrix[home_cluster][away_cluster]
-        
-        home_lambda *= factor
-        away_lambda *= factor
-        
-        # === Simulación rápida Poisson (sin Monte Carlo para speed) ===
-        
-        from scipy.stats import poisson
-        
-        max_goals = 6
-        
-        home_probs = [poisson.pmf(i, home_lambda) for i in range(max_goals)]
-        away_probs = [poisson.pmf(i, away_lambda) for i in range(max_goals)]
-        
-        home_win = 0
-        draw = 0
-        away_win = 0
-        
-        for i in range(max_goals):
-            for j in range(max_goals):
-                p = home_probs[i] * away_probs[j]
-                if i > j:
-                    home_win += p
-                elif i == j:
-                    draw += p
-                else:
-                    away_win += p
-        
-        probs = np.array([home_win, draw, away_win])
-        probs = probs / probs.sum()
-        
-        # === Resultado real ===
-        
-        if row["home_goals"] > row["away_goals"]:
-            actual = np.array([1,0,0])
-        elif row["home_goals"] == row["away_goals"]:
-            actual = np.array([0,1,0])
-        else:
-            actual = np.array([0,0,1])
-        
-        # === Log loss ===
-        eps = 1e-15
-        log_loss = -np.sum(actual * np.log(probs + eps))
-        log_losses.append(log_loss)
-        
-        # === Brier ===
-        brier = np.sum((probs - actual)**2)
-        brier_scores.append(brier)
-    
-    return np.mean(log_losses), np.mean(brier_scores)
+        home_lambda = home_lambda * factor
+        away_lambda = away_lambda * factor
+
+    return home_lambda, away_lambda, known
+
+
+def backtest_scores(df, team_stats, league_home_xg_avg, league_away_xg_avg, matchup_matrix):
+    """
+    Per-match log loss and Brier score of the 1X2 model.
+
+    Returns (log_losses, brier_scores, positions), where positions are the
+    row positions in df of the matches that could be scored (both teams
+    present in team_stats). df can be a DataFrame or a MatchArrays view.
+    """
+
+    # === Lambdas base + matchup (salta equipos sin stats) ===
+
+    home_lambda, away_lambda, known = calculate_match_lambdas(
+        df, team_stats, league_home_xg_avg, league_away_xg_avg, matchup_matrix
+    )
+    positions = np.flatnonzero(known)
+
+    # === Poisson truncado a 0-5 goles (sin Monte Carlo para speed) ===
+
+    matrices = score_matrix(home_lambda, away_lambda, max_goals=5)
+    probs = np.stack(match_result(matrices), axis=1)
+
+    # === Resultado real ===
+
+    home_goals = np.asarray(df["home_goals"])[known]
+    away_goals = np.asarray(df["away_goals"])[known]
+
+    actual = np.stack([
+        home_goals > away_goals,
+        home_goals == away_goals,
+        home_goals < away_goals
+    ], axis=1).astype(float)
 
+    # === Log loss ===
+    eps = 1e-15
+    log_losses = -np.sum(actual * np.log(probs + eps), axis=1)
+
+    # === Brier ===
+    brier_scores = np.sum((probs - actual) ** 2, axis=1)
+
+    return log_losses, brier_scores, positions
+
+
+def backtest_model(df, team_stats, league_home_xg_avg, league_away_xg_avg, matchup_matrix):
+
+    log_losses, brier_scores, _ = backtest_scores(
+        df, team_stats, league_home_xg_avg, league_away_xg_avg, matchup_matrix
+    )
+
+    return np.mean(log_losses), np.mean(brier_scores)
@@ -0,0 +1,198 @@
+import json
+import os
+import numpy as np
+
+from ml.markets import goal_probabilities
+
+
+SURFACE_TOTALS_LINES = (0.5, 1.5, 2.5, 3.5, 4.5, 5.5)
+
+
+def _output_names(totals_lines):
+    names = ["home_win", "draw", "away_win", "btts"]
+    names += ["over_" + str(line).replace(".", "_") for line in totals_lines]
+    return names
+
+
+def _surface_block(home_pmf, away_pmf, totals_lines):
+    """
+    Outputs for every (home, away) pair of two pmf blocks, shape
+    (n_home, n_away, n_outputs). Everything is a matrix product of the
+    marginals, so no score matrix is ever materialised.
+    """
+    max_goals = home_pmf.shape[1] - 1
+
+    away_cdf = np.cumsum(away_pmf, axis=1)
+    # away_cdf_prev[:, i] = P(away < i)
+    away_cdf_prev = np.concatenate([np.zeros((len(away_pmf), 1)), away_cdf[:, :-1]], axis=1)
+
+    draw = home_pmf @ away_pmf.T
+    home_win = home_pmf @ away_cdf_prev.T
+    total_mass = home_pmf.sum(axis=1)[:, None] * away_pmf.sum(axis=1)[None, :]
+    away_win = total_mass - home_win - draw
+
+    btts = np.outer(home_pmf[:, 1:].sum(axis=1), away_pmf[:, 1:].sum(axis=1))
+
+    outputs = [home_win, draw, away_win, btts]
+
+    goals = np.arange(max_goals + 1)
+    for line in totals_lines:
+        # P(total <= t) = Σ_i P(home=i)·P(away <= t-i)
+        t = int(np.floor(line))
+        shifted = np.zeros_like(away_cdf)
+        valid = goals <= t
+        shifted[:, valid] = away_cdf[:, t - goals[valid]]
+        outputs.append(total_mass - home_pmf @ shifted.T)
+
+    outputs = np.stack(outputs, axis=-1)
+
+    # Renormalizar la masa truncada (igual que score_matrix)
+    return outputs / total_mass[:, :, None]
+
+
+class ProbabilitySurface:
+    """
+    Precomputed 1X2 / BTTS / totals probabilities over a dense (λh, λa) grid.
+
+    Queries are answered by bilinear interpolation from a memory-mapped
+    array, so pricing is a handful of gathers per match instead of a
+    score matrix.
+
+    Error bounds: for bilinear interpolation on a grid of step h the error
+    is at most h²/8 · (max|∂²f/∂λh²| + max|∂²f/∂λa²|). build() estimates
+    the second derivatives from second differences on the grid and stores
+    the resulting bound per output in `error_bounds`; with the default
+    step of 0.02 it is around 1e-4 for every output. Lambdas outside the
+    grid are clipped to its edge, where no bound applies.
+    """
+
+    def __init__(self, values, lambda_min, step, outputs, lambda_uncertainty, error_bounds):
+        self.values = values
+        self.lambda_min = lambda_min
+        self.step = step
+        self.n_points = values.shape[0]
+        self.lambda_max = lambda_min + step * (self.n_points - 1)
+        self.outputs = list(outputs)
+        self.lambda_uncertainty = lambda_uncertainty
+        self.error_bounds = dict(error_bounds)
+
+        # Vista plana (n*n, n_outputs) para los gathers
+        self._flat = values.reshape(self.n_points * self.n_points, len(self.outputs))
+
+    # ==================== CONSTRUCCIÓN ====================
+
+    @classmethod
+    def build(cls, path,
+              lambda_min=0.05,
+              lambda_max=5.0,
+              step=0.02,
+              lambda_uncertainty=0.10,
+              max_goals=15,
+              totals_lines=SURFACE_TOTALS_LINES,
+              block_size=64):
+        """
+        Compute the surface and store it at `path` (.npy, memory-mapped)
+        with its metadata in `path + '.json'`.
+        """
+        n_points = int(round((lambda_max - lambda_min) / step)) + 1
+        grid = lambda_min + step * np.arange(n_points)
+        outputs = _output_names(totals_lines)
+
+        pmf = goal_probabilities(grid, max_goals, lambda_uncertainty)
+
+        values = np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.float64,
+            shape=(n_points, n_points, len(outputs))
+        )
+
+        # Por bloques de filas para acotar memoria
+        for start in range(0, n_points, block_size):
+            stop = min(start + block_size, n_points)
+            values[start:stop] = _surface_block(pmf[start:stop], pmf, totals_lines)
+
+        values.flush()
+
+        error_bounds = cls._estimate_error_bounds(values, step)
+
+        metadata = {
+            "lambda_min": lambda_min,
+            "step": step,
+            "n_points": n_points,
+            "outputs": outputs,
+            "lambda_uncertainty": lambda_uncertainty,
+            "max_goals": max_goals,
+            "error_bounds": error_bounds,
+        }
+        with open(path + ".json", "w") as f:
+            json.dump(metadata, f, indent=2)
+
+        return cls.load(path)
+
+    @staticmethod
+    def _estimate_error_bounds(values, step):
+        d2_home = np.abs(np.diff(values, n=2, axis=0)).max(axis=(0, 1)) / step ** 2
+        d2_away = np.abs(np.diff(values, n=2, axis=1)).max(axis=(0, 1)) / step ** 2
+        bounds = step ** 2 / 8 * (d2_home + d2_away)
+
+        return [float(b) for b in bounds]
+
+    @classmethod
+    def load(cls, path):
+        """Open a surface written by build() without reading it into memory."""
+        with open(path + ".json") as f:
+            metadata = json.load(f)
+
+        values = np.load(path, mmap_mode="r")
+
+        return cls(
+            values,
+            metadata["lambda_min"],
+            metadata["step"],
+            metadata["outputs"],
+            metadata["lambda_uncertainty"],
+            zip(metadata["outputs"], metadata["error_bounds"]),
+        )
+
+    @classmethod
+    def load_or_build(cls, path, **kwargs):
+        if os.path.exists(path) and os.path.exists(path + ".json"):
+            return cls.load(path)
+        return cls.build(path, **kwargs)
+
+    # ==================== CONSULTAS ====================
+
+    def lookup_array(self, home_lambdas, away_lambdas):
+        """
+        Interpolated outputs, shape (n_queries, n_outputs) in the order
+        of self.outputs.
+        """
+        home_lambdas = np.asarray(home_lambdas, dtype=float).ravel()
+        away_lambdas = np.asarray(away_lambdas, dtype=float).ravel()
+
+        last = self.n_points - 1
+
+        x = np.clip((home_lambdas - self.lambda_min) / self.step, 0, last)
+        y = np.clip((away_lambdas - self.lambda_min) / self.step, 0, last)
+
+        i0 = np.minimum(x.astype(np.intp), last - 1)
+        j0 = np.minimum(y.astype(np.intp), last - 1)
+        fx = (x - i0)[:, None]
+        fy = (y - j0)[:, None]
+
+        base = i0 * self.n_points + j0
+        flat = self._flat
+
+        # Interpolar primero a lo largo de λa y después de λh
+        low = flat[base] + (flat[base + 1] - flat[base]) * fy
+        high = flat[base + self.n_points] + (flat[base + self.n_points + 1] - flat[base + self.n_points]) * fy
+
+        return low + (high - low) * fx
+
+    def lookup(self, home_lambdas, away_lambdas):
+        """
+        Interpolated probabilities as a dict of arrays keyed like the
+        simulator output (home_win, draw, away_win, over_2_5, ...).
+        """
+        result = self.lookup_array(home_lambdas, away_lambdas)
+
+        return {name: result[:, k] for k, name in enumerate(self.outputs)}
@@ -0,0 +1,277 @@
+import math
+import numpy as np
+import pandas as pd
+
+from ml.model import STRENGTH_COLUMNS
+
+
+# Columnas del estado: log-multiplicadores por equipo, en el orden de STRENGTH_COLUMNS
+_HOME_ATTACK, _HOME_DEFENSE, _AWAY_ATTACK, _AWAY_DEFENSE = range(4)
+
+
+def _run(ratings, league_avgs, home_ids, away_ids, league_ids, home_xg, away_xg,
+         learning_rate, cross_rate, average_rate):
+    """
+    One sequential pass over sorted match arrays, updating ratings and
+    league averages in place.
+
+    Expected xG is league_avg · exp(attack + opponent defence), the same
+    form calculate_lambdas uses. Each side's ratings move by the Poisson
+    log-rate gradient (observed - expected) / expected scaled by
+    learning_rate; the team's ratings for the other venue move by
+    cross_rate times as much (the Pi-rating idea).
+
+    Returns the pre-match expected xG arrays (home, away).
+    """
+    n = len(home_ids)
+    expected_home = np.empty(n)
+    expected_away = np.empty(n)
+
+    # Bucle escalar sobre listas: mucho más rápido que indexar arrays de NumPy
+    state = ratings.tolist()
+    averages = league_avgs.tolist()
+
+    for k, (h, a, league, xg_h, xg_a) in enumerate(zip(
+            home_ids.tolist(), away_ids.tolist(), league_ids.tolist(),
+            home_xg.tolist(), away_xg.tolist())):
+
+        home, away, avg = state[h], state[a], averages[league]
+
+        mu_h = avg[0] * math.exp(home[_HOME_ATTACK] + away[_AWAY_DEFENSE])
+        mu_a = avg[1] * math.exp(away[_AWAY_ATTACK] + home[_HOME_DEFENSE])
+        expected_home[k] = mu_h
+        expected_away[k] = mu_a
+
+        error_h = learning_rate * (xg_h - mu_h) / mu_h
+        error_a = learning_rate * (xg_a - mu_a) / mu_a
+
+        home[_HOME_ATTACK] += error_h
+        home[_AWAY_ATTACK] += cross_rate * error_h
+        away[_AWAY_DEFENSE] += error_h
+        away[_HOME_DEFENSE] += cross_rate * error_h
+
+        away[_AWAY_ATTACK] += error_a
+        away[_HOME_ATTACK] += cross_rate * error_a
+        home[_HOME_DEFENSE] += error_a
+        home[_AWAY_DEFENSE] += cross_rate * error_a
+
+        avg[0] += average_rate * (xg_h - avg[0])
+        avg[1] += average_rate * (xg_a - avg[1])
+
+    ratings[:] = state
+    league_avgs[:] = averages
+
+    return expected_home, expected_away
+
+
+class XGRatingEngine:
+    """
+    Sequential xG ratings (Elo / Pi-rating style) for one or many leagues.
+
+    Every team keeps home/away attack and defence log-ratings; matches are
+    applied in date order in a single pass over compact arrays of team
+    ids and xG. The state can be checkpointed with save() and resumed
+    with load(), so new matches are applied incrementally.
+
+    strengths() returns (team_stats, league_home_xg_avg, league_away_xg_avg)
+    in the format of calculate_strengths, so it can replace it as the
+    input of calculate_lambdas / calculate_match_lambdas.
+    """
+
+    def __init__(self, learning_rate=0.06, cross_rate=0.5, average_rate=0.01,
+                 initial_home_xg=1.5, initial_away_xg=1.2):
+        self.learning_rate = learning_rate
+        self.cross_rate = cross_rate
+        self.average_rate = average_rate
+        self.initial_home_xg = initial_home_xg
+        self.initial_away_xg = initial_away_xg
+
+        self.teams = pd.Index([], dtype=object)
+        self.leagues = pd.Index([], dtype=object)
+        self.ratings = np.zeros((0, 4))
+        self.league_avgs = np.zeros((0, 2))
+        self.team_league = np.zeros(0, dtype=np.int64)
+        self.n_matches = 0
+
+        # Por liga: fecha del último partido aplicado y los (local, visitante)
+        # aplicados en esa fecha, para no repetirlos ni perder los posteriores
+        self.last_dates = np.array([], dtype="datetime64[ns]")
+        self._boundary = {}
+
+    # ==================== ACTUALIZACIÓN ====================
+
+    @staticmethod
+    def _match_arrays(matches):
+        matches = matches.reset_index()
+
+        if "league" not in matches.columns:
+            matches = matches.assign(league="")
+
+        order = np.argsort(pd.to_datetime(matches["date"]).to_numpy(), kind="stable")
+        return matches.iloc[order].reset_index(drop=True)
+
+    def _codes(self, names, attr):
+        # Añade al índice los nombres nuevos y devuelve códigos enteros
+        index = getattr(self, attr)
+        new = pd.Index(pd.unique(np.asarray(names, dtype=object))).difference(index, sort=False)
+
+        if len(new):
+            setattr(self, attr, index.append(new))
+            if attr == "teams":
+                self.ratings = np.vstack([self.ratings, np.zeros((len(new), 4))])
+                self.team_league = np.concatenate([self.team_league, np.zeros(len(new), dtype=np.int64)])
+            else:
+                initial = [[self.initial_home_xg, self.initial_away_xg]] * len(new)
+                self.league_avgs = np.vstack([self.league_avgs, initial])
+                self.last_dates = np.concatenate([
+                    self.last_dates, np.full(len(new), np.datetime64("NaT"), dtype="datetime64[ns]")
+                ])
+
+        return getattr(self, attr).get_indexer(names)
+
+    def update(self, matches):
+        """
+        Apply matches (Understat team_match_stats or any frame with date,
+        home_team, away_team, home_xg, away_xg and optionally league).
+
+        Each league keeps its own last applied date: matches before it are
+        skipped, and matches on that date are skipped only if that exact
+        (home, away) pairing was already applied. The same history (one
+        league or several) can therefore be passed again after new rounds
+        are played.
+
+        Returns a DataFrame of the applied matches with the pre-match
+        expected_home_xg / expected_away_xg.
+        """
+        matches = self._match_arrays(matches)
+        matches = matches.dropna(subset=["home_xg", "away_xg"]).reset_index(drop=True)
+        matches = matches[self._unapplied(matches)].reset_index(drop=True)
+
+        if matches.empty:
+            return matches.assign(expected_home_xg=[], expected_away_xg=[])
+
+        dates = pd.to_datetime(matches["date"]).to_numpy().astype("datetime64[ns]")
+
+        home_ids = self._codes(matches["home_team"].to_numpy(), "teams")
+        away_ids = self._codes(matches["away_team"].to_numpy(), "teams")
+        league_ids = self._codes(matches["league"].to_numpy(), "leagues")
+
+        expected_home, expected_away = _run(
+            self.ratings, self.league_avgs,
+            home_ids, away_ids, league_ids,
+            matches["home_xg"].to_numpy(dtype=float),
+            matches["away_xg"].to_numpy(dtype=float),
+            self.learning_rate, self.cross_rate, self.average_rate
+        )
+
+        # Liga de cada equipo = la de su último partido (posición más alta)
+        n = len(matches)
+        positions = np.concatenate([np.arange(n), np.arange(n)])
+        team_ids = np.concatenate([home_ids, away_ids])
+        last_position = np.full(len(self.teams), -1)
+        np.maximum.at(last_position, team_ids, positions)
+        played = np.flatnonzero(last_position >= 0)
+        self.team_league[played] = league_ids[last_position[played]]
+
+        for league in np.unique(league_ids):
+            in_league = league_ids == league
+            last = dates[in_league].max()
+            at_last = in_league & (dates == last)
+            pairs = set(zip(matches["home_team"][at_last], matches["away_team"][at_last]))
+
+            if last == self.last_dates[league]:
+                self._boundary[league] |= pairs
+            else:
+                self._boundary[league] = pairs
+            self.last_dates[league] = last
+
+        self.n_matches += n
+
+        return matches.assign(expected_home_xg=expected_home, expected_away_xg=expected_away)
+
+    def _unapplied(self, matches):
+        """Mask of the matches not applied yet (see update)."""
+        dates = pd.to_datetime(matches["date"]).to_numpy().astype("datetime64[ns]")
+        codes = self.leagues.get_indexer(matches["league"])
+
+        keep = np.ones(len(matches), dtype=bool)
+        known = codes >= 0
+        if not known.any():
+            return keep
+
+        last = self.last_dates[codes[known]]
+        keep[known] = ~(dates[known] < last)
+
+        same_day = np.flatnonzero(known)[dates[known] == last]
+        for row in same_day:
+            pair = (matches["home_team"].iat[row], matches["away_team"].iat[row])
+            keep[row] = pair not in self._boundary.get(codes[row], set())
+
+        return keep
+
+    # ==================== SALIDA ====================
+
+    def strengths(self, league=None):
+        """
+        Current ratings as calculate_strengths output.
+
+        Args:
+            league: League whose teams and averages to return (needed when
+                several leagues were applied)
+
+        Returns:
+            (team_stats, league_home_xg_avg, league_away_xg_avg)
+        """
+        if league is None:
+            if len(self.leagues) > 1:
+                raise ValueError("Several leagues rated; pass league=...")
+            code = 0
+        else:
+            code = self.leagues.get_loc(league)
+
+        rows = self.team_league == code
+
+        team_stats = pd.DataFrame(np.exp(self.ratings[rows]), columns=STRENGTH_COLUMNS)
+        team_stats.insert(0, "team", self.teams[rows].to_numpy())
+
+        league_home_xg_avg, league_away_xg_avg = self.league_avgs[code]
+
+        return team_stats, league_home_xg_avg, league_away_xg_avg
+
+    # ==================== CHECKPOINTS ====================
+
+    def save(self, path):
+        """Checkpoint the rating state to a .npz file."""
+        np.savez(
+            path,
+            ratings=self.ratings,
+            league_avgs=self.league_avgs,
+            team_league=self.team_league,
+            teams=np.asarray(self.teams, dtype=str),
+            leagues=np.asarray(self.leagues, dtype=str),
+            last_dates=self.last_dates,
+            boundary=np.array(
+                [(league, home, away) for league, pairs in self._boundary.items() for home, away in pairs],
+                dtype=str
+            ).reshape(-1, 3),
+            n_matches=np.array([self.n_matches]),
+            params=np.array([self.learning_rate, self.cross_rate, self.average_rate,
+                             self.initial_home_xg, self.initial_away_xg]),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Resume from a checkpoint written by save()."""
+        with np.load(path) as state:
+            engine = cls(*state["params"].tolist())
+            engine.ratings = state["ratings"]
+            engine.league_avgs = state["league_avgs"]
+            engine.team_league = state["team_league"]
+            engine.teams = pd.Index(state["teams"].tolist(), dtype=object)
+            engine.leagues = pd.Index(state["leagues"].tolist(), dtype=object)
+            engine.last_dates = state["last_dates"]
+            for league, home, away in state["boundary"].tolist():
+                engine._boundary.setdefault(int(league), set()).add((home, away))
+            engine.n_matches = int(state["n_matches"][0])
+
+        return engine
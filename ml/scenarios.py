@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+
+from ml.markets import match_result, score_matrix_derivatives, totals
+from ml.model import STRENGTH_COLUMNS, matchup_factor_array
+
+
+# Atajos: "attack" / "defense" cambian la columna de local y la de visitante
+STRENGTH_ALIASES = {
+    "attack": ["home_attack_strength", "away_attack_strength"],
+    "defense": ["home_defense_strength", "away_defense_strength"],
+}
+
+
+def _linear_outputs(matrices, totals_lines):
+    """
+    Outputs that are linear in the score matrix, so the same code gives
+    probabilities (from matrices) and derivatives (from derivative
+    matrices).
+    """
+    home_win, draw, away_win = match_result(matrices)
+
+    outputs = {"home_win": home_win, "draw": draw, "away_win": away_win}
+
+    over = totals(matrices, totals_lines)
+    for k, line in enumerate(totals_lines):
+        outputs["over_" + str(line).replace(".", "_")] = over[:, k]
+
+    # BTTS = total - sin gol local - sin gol visitante + 0-0 (total = 1 o 0)
+    outputs["btts"] = (
+        matrices.sum(axis=(1, 2)) - matrices[:, 0, :].sum(axis=-1)
+        - matrices[:, :, 0].sum(axis=-1) + matrices[:, 0, 0]
+    )
+
+    return outputs
+
+
+def _scenario_multipliers(scenarios, teams, n_clusters):
+    """
+    Multiplier arrays for a batch of scenarios:
+    strengths (S, n_teams, 4), league averages (S, 2), matchup (S, C, C).
+    """
+    n = len(scenarios)
+    team_index = pd.Index(teams)
+
+    strengths = np.ones((n, len(teams), len(STRENGTH_COLUMNS)))
+    averages = np.ones((n, 2))
+    matchup = np.ones((n, n_clusters, n_clusters))
+
+    for s, scenario in enumerate(scenarios):
+        for team, changes in scenario.get("strengths", {}).items():
+            row = team_index.get_loc(team)
+            for column, multiplier in changes.items():
+                for name in STRENGTH_ALIASES.get(column, [column]):
+                    strengths[s, row, STRENGTH_COLUMNS.index(name)] *= multiplier
+
+        averages[s, 0] *= scenario.get("league_home_xg_avg", 1.0)
+        averages[s, 1] *= scenario.get("league_away_xg_avg", 1.0)
+
+        for (home_cluster, away_cluster), multiplier in scenario.get("matchup", {}).items():
+            matchup[s, home_cluster, away_cluster] *= multiplier
+
+    return strengths, averages, matchup
+
+
+def evaluate_scenarios(matches, team_stats,
+                       league_home_xg_avg,
+                       league_away_xg_avg,
+                       scenarios,
+                       matchup_matrix=None,
+                       lambda_uncertainty=0.10,
+                       max_goals=10,
+                       totals_lines=(2.5,)):
+    """
+    What-if analysis: every scenario on every match in one vectorised call.
+
+    Each scenario is a dict of multipliers (all optional):
+    - "name": label for the output
+    - "strengths": {team: {column: multiplier}}, column being a strength
+      column or "attack" / "defense" for both venues
+    - "league_home_xg_avg", "league_away_xg_avg": multipliers
+    - "matchup": {(home_cluster, away_cluster): multiplier} on
+      matchup_matrix (needs a "cluster" column in team_stats)
+
+    Lambdas follow calculate_lambdas (times the matchup factor when
+    matchup_matrix is given). Probabilities come from score matrices with
+    the simulator's lambda_uncertainty, so they are what
+    monte_carlo_simulation converges to. For each output the analytic
+    derivatives d_<output>_d_home_lambda and d_<output>_d_away_lambda
+    are also returned.
+
+    Args:
+        matches: DataFrame with home_team and away_team
+        scenarios: List of scenario dicts (an empty dict is the baseline)
+
+    Returns:
+        DataFrame with one row per (scenario, match)
+    """
+    teams = team_stats["team"].to_numpy()
+    team_index = pd.Index(teams)
+    base = team_stats[STRENGTH_COLUMNS].to_numpy(dtype=float)
+
+    home_idx = team_index.get_indexer(matches["home_team"])
+    away_idx = team_index.get_indexer(matches["away_team"])
+    if (home_idx < 0).any() or (away_idx < 0).any():
+        raise KeyError("Some match teams are not in team_stats")
+
+    if matchup_matrix is not None:
+        clusters = team_stats["cluster"].to_numpy()
+    else:
+        clusters = np.zeros(len(teams), dtype=int)
+
+    # Clusters sin entrada en matchup_matrix (de un equipo o pedidos en un
+    # escenario) tienen factor base 1
+    requested = [
+        cluster
+        for scenario in scenarios
+        for pair in scenario.get("matchup", {})
+        for cluster in pair
+    ]
+    n_clusters = max([int(clusters.max(initial=0))] + requested) + 1
+    base_matchup = matchup_factor_array(matchup_matrix or {}, n_clusters)
+    n_clusters = len(base_matchup)
+
+    strength_mult, average_mult, matchup_mult = _scenario_multipliers(scenarios, teams, n_clusters)
+
+    # (S, n_teams, 4) -> (S, n_matches) por columna
+    strengths = base[None] * strength_mult
+    home = strengths[:, home_idx]
+    away = strengths[:, away_idx]
+
+    home_clusters = clusters[home_idx]
+    away_clusters = clusters[away_idx]
+    factor = base_matchup[home_clusters, away_clusters][None] * matchup_mult[:, home_clusters, away_clusters]
+
+    home_lambda = (
+        home[..., STRENGTH_COLUMNS.index("home_attack_strength")]
+        * away[..., STRENGTH_COLUMNS.index("away_defense_strength")]
+        * league_home_xg_avg * average_mult[:, [0]]
+        * factor
+    )
+    away_lambda = (
+        away[..., STRENGTH_COLUMNS.index("away_attack_strength")]
+        * home[..., STRENGTH_COLUMNS.index("home_defense_strength")]
+        * league_away_xg_avg * average_mult[:, [1]]
+        * factor
+    )
+
+    matrices, d_home, d_away = score_matrix_derivatives(
+        home_lambda.ravel(), away_lambda.ravel(), max_goals, lambda_uncertainty
+    )
+
+    probabilities = _linear_outputs(matrices, totals_lines)
+    home_derivatives = _linear_outputs(d_home, totals_lines)
+    away_derivatives = _linear_outputs(d_away, totals_lines)
+
+    n_scenarios, n_matches = home_lambda.shape
+    names = [scenario.get("name", f"scenario_{s}") for s, scenario in enumerate(scenarios)]
+
+    result = pd.DataFrame({
+        "scenario": np.repeat(names, n_matches),
+        "home_team": np.tile(matches["home_team"].to_numpy(), n_scenarios),
+        "away_team": np.tile(matches["away_team"].to_numpy(), n_scenarios),
+        "home_lambda": home_lambda.ravel(),
+        "away_lambda": away_lambda.ravel(),
+    })
+
+    for name in probabilities:
+        result[name] = probabilities[name]
+    for name in probabilities:
+        result[f"d_{name}_d_home_lambda"] = home_derivatives[name]
+        result[f"d_{name}_d_away_lambda"] = away_derivatives[name]
+
+    return result
+
+
+def what_if(home_team, away_team, team_stats,
+            league_home_xg_avg,
+            league_away_xg_avg,
+            scenarios,
+            matchup_matrix=None,
+            **kwargs):
+    """evaluate_scenarios for a single match, baseline first."""
+    matches = pd.DataFrame({"home_team": [home_team], "away_team": [away_team]})
+
+    return evaluate_scenarios(
+        matches, team_stats, league_home_xg_avg, league_away_xg_avg,
+        [{"name": "baseline"}] + list(scenarios), matchup_matrix, **kwargs
+    )
@@ -1,4 +1,8 @@
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.stats import gamma, norm, qmc
+
+from ml.model import calculate_match_lambdas
 
 
 def monte_carlo_simulation(home_lambda, away_lambda,
@@ -45,3 +49,340 @@ def monte_carlo_simulation(home_lambda, away_lambda,
         "away_win": away_wins / n_simulations,
         "over_2_5": over_2_5 / n_simulations
     }
+
+
+SIMULATED_PROBABILITIES = ("home_win", "draw", "away_win", "over_2_5")
+
+# z del intervalo de Wilson (95%)
+WILSON_Z = 1.96
+
+
+def wilson_standard_errors(counts, n):
+    """
+    Standard error implied by the Wilson score interval (half-width / z).
+
+    Unlike sqrt(p(1-p)/n) it is not 0 at p = 0 or 1; with no hits it is
+    about z / (2n), the Wilson upper bound for a rare outcome.
+    """
+    p = np.asarray(counts, dtype=float) / n
+    z2 = WILSON_Z ** 2
+    return np.sqrt(p * (1 - p) / n + z2 / (4 * n ** 2)) / (1 + z2 / n)
+
+
+def _simulate_chunk(home_lambda, away_lambda, lambda_uncertainty, n_simulations, seed_sequence):
+    """
+    Vectorised chunk of the same model as monte_carlo_simulation.
+
+    Returns the hit counts for each of SIMULATED_PROBABILITIES.
+    """
+    rng = np.random.default_rng(seed_sequence)
+
+    lambda_home_sim = rng.normal(home_lambda, home_lambda * lambda_uncertainty, n_simulations)
+    lambda_away_sim = rng.normal(away_lambda, away_lambda * lambda_uncertainty, n_simulations)
+
+    home_goals = rng.poisson(np.maximum(lambda_home_sim, 0.01))
+    away_goals = rng.poisson(np.maximum(lambda_away_sim, 0.01))
+
+    return np.array([
+        np.count_nonzero(home_goals > away_goals),
+        np.count_nonzero(home_goals == away_goals),
+        np.count_nonzero(home_goals < away_goals),
+        np.count_nonzero(home_goals + away_goals > 2),
+    ])
+
+
+def adaptive_monte_carlo_simulation(home_lambda, away_lambda,
+                                    tolerance=0.001,
+                                    targets=SIMULATED_PROBABILITIES,
+                                    lambda_uncertainty=0.10,
+                                    chunk_size=20000,
+                                    min_simulations=20000,
+                                    max_simulations=2000000,
+                                    min_hits=10,
+                                    n_workers=1,
+                                    seed=None):
+    """
+    Monte Carlo that runs in chunks until the standard error of every
+    probability in `targets` (a subset of SIMULATED_PROBABILITIES) is
+    below `tolerance` (or max_simulations is reached).
+
+    Standard errors come from the Wilson score interval, and a target
+    only counts as converged once it has at least min_hits hits and
+    min_hits misses (where the normal approximation holds). A rare
+    outcome (e.g. p ~ 1e-4) therefore keeps the run going until it has
+    actually been observed, instead of passing on a tiny SE after the
+    first chunk; leave it out of `targets` if its precision is not needed.
+
+    Each chunk draws from its own SeedSequence child, so the streams are
+    independent across processes and a run is reproducible for a given
+    (seed, n_workers). With n_workers > 1 every round runs n_workers
+    chunks in a process pool.
+
+    Returns the probabilities plus standard_errors, n_simulations and
+    converged.
+    """
+    target_idx = [SIMULATED_PROBABILITIES.index(name) for name in targets]
+    seed_sequence = np.random.SeedSequence(seed)
+
+    counts = np.zeros(len(SIMULATED_PROBABILITIES))
+    n_done = 0
+
+    executor = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
+
+    try:
+        while True:
+            chunk_seeds = seed_sequence.spawn(n_workers)
+            args = [
+                (home_lambda, away_lambda, lambda_uncertainty, chunk_size, child)
+                for child in chunk_seeds
+            ]
+
+            if executor is None:
+                results = [_simulate_chunk(*arg) for arg in args]
+            else:
+                results = executor.map(_simulate_chunk, *zip(*args))
+
+            for result in results:
+                counts += result
+            n_done += chunk_size * n_workers
+
+            probabilities = counts / n_done
+            standard_errors = wilson_standard_errors(counts, n_done)
+            observed = np.minimum(counts, n_done - counts) >= min_hits
+
+            converged = bool(np.all(((standard_errors < tolerance) & observed)[target_idx]))
+
+            if (converged and n_done >= min_simulations) or n_done >= max_simulations:
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    results = dict(zip(SIMULATED_PROBABILITIES, probabilities))
+    results["standard_errors"] = dict(zip(SIMULATED_PROBABILITIES, standard_errors))
+    results["n_simulations"] = n_done
+    results["converged"] = converged
+
+    return results
+
+
+def monte_carlo_matches(df, team_stats,
+                        league_home_xg_avg,
+                        league_away_xg_avg,
+                        matchup_matrix=None,
+                        n_simulations=100000,
+                        lambda_uncertainty=0.10,
+                        seed=None):
+    """
+    Monte Carlo for every match of a table (DataFrame or MatchArrays
+    view from data/shared_arrays.py), one SeedSequence child per match.
+
+    Returns dict of arrays (home_win, draw, away_win, over_2_5) plus
+    positions, the row positions of the simulated matches.
+    """
+    home_lambdas, away_lambdas, known = calculate_match_lambdas(
+        df, team_stats, league_home_xg_avg, league_away_xg_avg, matchup_matrix
+    )
+
+    seeds = np.random.SeedSequence(seed).spawn(len(home_lambdas))
+
+    counts = np.array([
+        _simulate_chunk(home_lambda, away_lambda, lambda_uncertainty, n_simulations, child)
+        for home_lambda, away_lambda, child in zip(home_lambdas, away_lambdas, seeds)
+    ]).reshape(-1, len(SIMULATED_PROBABILITIES))
+
+    results = dict(zip(SIMULATED_PROBABILITIES, (counts / n_simulations).T))
+    results["positions"] = np.flatnonzero(known)
+
+    return results
+
+
+# ==================== QUASI-MONTE CARLO ====================
+
+def _poisson_inverse_cdf(uniforms, lambdas, max_goals=30):
+    """Poisson quantile of each uniform for its own λ (vectorised inversion)."""
+    pmf = np.exp(-lambdas)
+    cdf = pmf.copy()
+    goals = np.zeros(np.broadcast(uniforms, lambdas).shape, dtype=np.int64)
+
+    for k in range(1, max_goals + 1):
+        above = uniforms > cdf
+        if not above.any():
+            break
+        goals += above
+        pmf = pmf * lambdas / k
+        cdf = cdf + pmf
+
+    return goals
+
+
+def _noisy_lambdas(uniforms, lambdas, lambda_uncertainty, distribution):
+    """
+    Lambda draws by inversion, plus their exact mean (the control-variate
+    mean of the goals).
+
+    "normal" is the simulator's Normal(λ, λ·uncertainty) clipped at 0.01;
+    "gamma" has mean λ and coefficient of variation lambda_uncertainty.
+    """
+    if lambda_uncertainty <= 0:
+        return np.broadcast_arrays(lambdas, uniforms)[0], lambdas
+
+    if distribution == "gamma":
+        shape = 1 / lambda_uncertainty ** 2
+        return gamma.ppf(uniforms, shape, scale=lambdas / shape), lambdas
+
+    sigma = lambdas * lambda_uncertainty
+    draws = np.maximum(norm.ppf(uniforms, lambdas, sigma), 0.01)
+
+    # E[max(X, c)] con X ~ N(λ, σ)
+    a = (0.01 - lambdas) / sigma
+    mean = 0.01 * norm.cdf(a) + lambdas * norm.sf(a) + sigma * norm.pdf(a)
+
+    return draws, mean
+
+
+def _qmc_outcomes(points, home_lambdas, away_lambdas, lambda_uncertainty, distribution):
+    """
+    Outcome indicators (n_pairs, n_points, 4) and goal controls
+    (n_pairs, n_points, 2) minus their known means.
+
+    points is (n_points, 4), shared by every pair, or (n_pairs, n_points, 4).
+    """
+    if points.ndim == 2:
+        points = points[None]
+
+    home_sim, home_mean = _noisy_lambdas(points[..., 0], home_lambdas[:, None],
+                                         lambda_uncertainty, distribution)
+    away_sim, away_mean = _noisy_lambdas(points[..., 1], away_lambdas[:, None],
+                                         lambda_uncertainty, distribution)
+
+    home_goals = _poisson_inverse_cdf(points[..., 2], home_sim)
+    away_goals = _poisson_inverse_cdf(points[..., 3], away_sim)
+
+    outcomes = np.stack([
+        home_goals > away_goals,
+        home_goals == away_goals,
+        home_goals < away_goals,
+        home_goals + away_goals > 2,
+    ], axis=-1).astype(float)
+
+    controls = np.stack([home_goals - home_mean, away_goals - away_mean], axis=-1)
+
+    return outcomes, controls
+
+
+def qmc_simulation(home_lambda, away_lambda,
+                   n_simulations=4096,
+                   lambda_uncertainty=0.10,
+                   n_replicates=16,
+                   antithetic=False,
+                   control_variates=True,
+                   common_random_numbers=True,
+                   distribution="normal",
+                   seed=None):
+    """
+    Randomised quasi-Monte Carlo version of monte_carlo_simulation.
+
+    Each replicate is a scrambled Sobol sequence of 4-dimensional points
+    (2 for the lambda noise, 2 for the goals), mapped by inverse CDF to
+    the lambda and Poisson draws; the spread of the n_replicates
+    independent scramblings gives an honest standard error.
+
+    Options:
+    - antithetic: also evaluate 1 - u for every point (off by default:
+      on top of scrambled Sobol points it rarely helps)
+    - control_variates: correct each estimate with the simulated goals,
+      whose exact mean is known (regression coefficient pooled over all
+      draws)
+    - common_random_numbers: with arrays of lambdas, every pair uses the
+      same points, so differences between pairs (scenarios, what-ifs)
+      have much lower variance than the probabilities themselves
+    - distribution: "normal" (as monte_carlo_simulation) or "gamma"
+
+    n_simulations per replicate is rounded up to a power of two (Sobol
+    balance). Returns the probabilities (floats, or arrays for arrays of
+    lambdas) plus standard_errors, variance_reduction (plain Monte Carlo
+    variance over this estimator's variance, for the same number of
+    draws), n_simulations and effective_simulations.
+    """
+    scalar = np.ndim(home_lambda) == 0 and np.ndim(away_lambda) == 0
+    home_lambdas, away_lambdas = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(home_lambda, dtype=float)),
+        np.atleast_1d(np.asarray(away_lambda, dtype=float))
+    )
+    n_pairs = len(home_lambdas)
+
+    m = int(np.ceil(np.log2(max(n_simulations, 2))))
+    rng = np.random.default_rng(seed)
+
+    n_draws = 2 ** m * (2 if antithetic else 1)
+    replicate_means = np.zeros((n_replicates, n_pairs, len(SIMULATED_PROBABILITIES)))
+    replicate_controls = np.zeros((n_replicates, n_pairs, 2))
+
+    # Acumuladores para el coeficiente de regresión (sumas sobre todas las muestras)
+    cross = np.zeros((n_pairs, 2, len(SIMULATED_PROBABILITIES)))
+    gram = np.zeros((n_pairs, 2, 2))
+    outcome_sums = np.zeros((n_pairs, len(SIMULATED_PROBABILITIES)))
+    control_sums = np.zeros((n_pairs, 2))
+
+    for r in range(n_replicates):
+        if common_random_numbers:
+            # (n_points, 4): _qmc_outcomes los reparte entre todos los pares
+            points = qmc.Sobol(d=4, scramble=True, seed=rng).random_base2(m)
+        else:
+            points = np.stack([
+                qmc.Sobol(d=4, scramble=True, seed=rng).random_base2(m) for _ in range(n_pairs)
+            ])
+
+        if antithetic:
+            points = np.concatenate([points, 1 - points], axis=-2)
+
+        # Los puntos de Sobol pueden valer 0 exacto: evitar cuantiles infinitos
+        points = np.clip(points, 1e-12, 1 - 1e-12)
+
+        # Una sola llamada para todos los pares: (n_pairs, n_points, ...)
+        outcomes, controls = _qmc_outcomes(points, home_lambdas, away_lambdas,
+                                           lambda_uncertainty, distribution)
+
+        replicate_means[r] = outcomes.mean(axis=1)
+        replicate_controls[r] = controls.mean(axis=1)
+
+        outcome_sums += outcomes.sum(axis=1)
+        control_sums += controls.sum(axis=1)
+        cross += np.einsum("npc,npo->nco", controls, outcomes)
+        gram += np.einsum("npc,npd->ncd", controls, controls)
+
+    n_total = n_draws * n_replicates
+    plain_probabilities = outcome_sums / n_total
+
+    estimates = replicate_means
+    if control_variates:
+        # Covarianzas muestrales -> beta = Cov(C, C)^-1 Cov(C, Y)
+        control_mean = control_sums / n_total
+        cov_cc = gram / n_total - control_mean[:, :, None] * control_mean[:, None, :]
+        cov_cy = cross / n_total - control_mean[:, :, None] * plain_probabilities[:, None, :]
+        beta = np.linalg.solve(cov_cc + 1e-12 * np.eye(2), cov_cy)
+        estimates = replicate_means - np.einsum("rnc,nco->rno", replicate_controls, beta)
+
+    probabilities = estimates.mean(axis=0)
+    standard_errors = estimates.std(axis=0, ddof=1) / np.sqrt(n_replicates)
+
+    plain_variance = plain_probabilities * (1 - plain_probabilities) / n_total
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance_reduction = plain_variance / standard_errors ** 2
+
+    def unpack(values):
+        values = dict(zip(SIMULATED_PROBABILITIES, values.T))
+        if scalar:
+            return {name: float(value[0]) for name, value in values.items()}
+        return values
+
+    results = unpack(probabilities)
+    results["standard_errors"] = unpack(standard_errors)
+    results["variance_reduction"] = unpack(variance_reduction)
+    results["n_simulations"] = n_total
+    results["effective_simulations"] = {
+        name: n_total * value for name, value in results["variance_reduction"].items()
+    }
+
+    return results
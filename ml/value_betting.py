@@ -0,0 +1,200 @@
+import os
+import numpy as np
+import pandas as pd
+
+from ml.markets import ScoreMatrixCache, match_result, totals
+from ml.model import calculate_match_lambdas
+
+
+# Selecciones valoradas: (columna de cuota, probabilidad del modelo)
+SELECTIONS = {
+    "home": ("odds_home", "home_win"),
+    "draw": ("odds_draw", "draw"),
+    "away": ("odds_away", "away_win"),
+    "over_2_5": ("odds_over_2_5", "over_2_5"),
+    "under_2_5": ("odds_under_2_5", "under_2_5"),
+}
+
+# Mercados cuyo margen se elimina en conjunto
+MARKET_GROUPS = {
+    "1x2": ["home", "draw", "away"],
+    "totals_2_5": ["over_2_5", "under_2_5"],
+}
+
+# Nombres de columna de los CSV de football-data.co.uk (cuotas Bet365)
+FOOTBALL_DATA_COLUMNS = {
+    "Date": "date",
+    "HomeTeam": "home_team",
+    "AwayTeam": "away_team",
+    "B365H": "odds_home",
+    "B365D": "odds_draw",
+    "B365A": "odds_away",
+    "B365>2.5": "odds_over_2_5",
+    "B365<2.5": "odds_under_2_5",
+}
+
+
+def iter_odds(path, chunksize=50000, column_map=None):
+    """
+    Read an odds file (CSV or Parquet) in chunks.
+
+    column_map renames source columns to home_team, away_team and
+    odds_home / odds_draw / odds_away / odds_over_2_5 / odds_under_2_5
+    (e.g. FOOTBALL_DATA_COLUMNS).
+    """
+
+    if path.endswith(".parquet"):
+        frame = pd.read_parquet(path)
+        chunks = (frame.iloc[start:start + chunksize] for start in range(0, len(frame), chunksize))
+    else:
+        chunks = pd.read_csv(path, chunksize=chunksize)
+
+    for chunk in chunks:
+        if column_map:
+            chunk = chunk.rename(columns=column_map)
+        yield chunk
+
+
+def remove_overround(odds):
+    """
+    Proportional overround removal.
+
+    odds has shape (n, k) for the k outcomes of one market. Returns
+    (fair_probabilities, overround); rows with a missing price get NaN.
+    """
+
+    implied = 1 / np.asarray(odds, dtype=float)
+    booksum = implied.sum(axis=1, keepdims=True)
+
+    return implied / booksum, booksum[:, 0] - 1
+
+
+def model_probabilities(matches, team_stats,
+                        league_home_xg_avg,
+                        league_away_xg_avg,
+                        matchup_matrix=None,
+                        lambda_uncertainty=0.10,
+                        cache=None):
+    """
+    Batch model probabilities (home_win, draw, away_win, over_2_5,
+    under_2_5) for a table of matches; NaN for unknown teams.
+
+    lambda_uncertainty is the simulator's relative lambda noise, so the
+    probabilities match monte_carlo_simulation (ignored when a cache is
+    passed: the cache's own setting applies).
+    """
+
+    home_lambdas, away_lambdas, known = calculate_match_lambdas(
+        matches, team_stats, league_home_xg_avg, league_away_xg_avg, matchup_matrix
+    )
+
+    if cache is None:
+        cache = ScoreMatrixCache(lambda_uncertainty=lambda_uncertainty)
+
+    probabilities = {name: np.full(len(known), np.nan) for name in
+                     ("home_win", "draw", "away_win", "over_2_5", "under_2_5")}
+
+    if known.any():
+        matrices = cache.get(home_lambdas, away_lambdas)
+        home_win, draw, away_win = match_result(matrices)
+        over = totals(matrices, [2.5])[:, 0]
+
+        for name, values in (("home_win", home_win), ("draw", draw), ("away_win", away_win),
+                             ("over_2_5", over), ("under_2_5", 1 - over)):
+            probabilities[name][known] = values
+
+    return probabilities
+
+
+def score_value_bets(odds, team_stats,
+                     league_home_xg_avg,
+                     league_away_xg_avg,
+                     matchup_matrix=None,
+                     standardize=None,
+                     kelly_fraction=0.25,
+                     lambda_uncertainty=0.10,
+                     cache=None):
+    """
+    Join a chunk of odds to the model and score every selection.
+
+    Team names on both sides go through `standardize` (e.g.
+    DataHub.standardize_team_name). For each selection present in the
+    odds the result gets prob_*, fair_*, ev_* and kelly_* columns, plus
+    one overround_* column per market; everything is computed on
+    (n_rows, n_selections) arrays.
+    """
+
+    result = odds.reset_index(drop=True).copy()
+
+    if standardize is not None:
+        names = pd.unique(pd.concat([result["home_team"], result["away_team"], team_stats["team"]]))
+        mapping = {name: standardize(name) for name in names}
+
+        result["home_team"] = result["home_team"].map(mapping)
+        result["away_team"] = result["away_team"].map(mapping)
+        team_stats = team_stats.assign(team=team_stats["team"].map(mapping))
+
+    probabilities = model_probabilities(
+        result, team_stats, league_home_xg_avg, league_away_xg_avg, matchup_matrix,
+        lambda_uncertainty, cache
+    )
+
+    selections = [name for name, (odds_col, _) in SELECTIONS.items() if odds_col in result.columns]
+
+    prices = result[[SELECTIONS[name][0] for name in selections]].to_numpy(dtype=float)
+    model = np.column_stack([probabilities[SELECTIONS[name][1]] for name in selections])
+
+    fair = np.full_like(prices, np.nan)
+    for market, members in MARKET_GROUPS.items():
+        columns = [selections.index(name) for name in members if name in selections]
+        if len(columns) == len(members):
+            fair[:, columns], overround = remove_overround(prices[:, columns])
+            result[f"overround_{market}"] = overround
+
+    expected_value = model * prices - 1
+
+    # Kelly: f* = (p·o - 1) / (o - 1), sin apuestas negativas
+    with np.errstate(invalid="ignore", divide="ignore"):
+        kelly = np.clip(expected_value / (prices - 1), 0, None) * kelly_fraction
+
+    for k, name in enumerate(selections):
+        result[f"prob_{name}"] = model[:, k]
+        result[f"fair_{name}"] = fair[:, k]
+        result[f"ev_{name}"] = expected_value[:, k]
+        result[f"kelly_{name}"] = kelly[:, k]
+
+    return result
+
+
+def stream_value_bets(odds_path, output_path, team_stats,
+                      league_home_xg_avg,
+                      league_away_xg_avg,
+                      matchup_matrix=None,
+                      standardize=None,
+                      kelly_fraction=0.25,
+                      lambda_uncertainty=0.10,
+                      chunksize=50000,
+                      column_map=None):
+    """
+    Score a whole odds file chunk by chunk and append each scored chunk
+    to output_path (CSV), so memory stays bounded by chunksize.
+
+    Returns the number of rows written.
+    """
+
+    cache = ScoreMatrixCache(lambda_uncertainty=lambda_uncertainty)
+    written = 0
+
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    for chunk in iter_odds(odds_path, chunksize, column_map):
+        scored = score_value_bets(
+            chunk, team_stats, league_home_xg_avg, league_away_xg_avg,
+            matchup_matrix, standardize, kelly_fraction, lambda_uncertainty, cache
+        )
+
+        scored.to_csv(output_path, mode="a", header=written == 0, index=False)
+        written += len(scored)
+
+    return written
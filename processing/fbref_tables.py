@@ -0,0 +1,17 @@
+import pandas as pd
+
+
+def flatten_columns(table):
+    """
+    Lowercased flat column names for FBref tables, joining MultiIndex
+    levels with "_" (("", "xG") -> "xg", ("SCA 1", "event") -> "sca 1_event").
+    """
+    if isinstance(table.columns, pd.MultiIndex):
+        table.columns = [
+            "_".join(str(level) for level in col if str(level)).strip().lower()
+            for col in table.columns
+        ]
+    else:
+        table.columns = [str(col).lower() for col in table.columns]
+
+    return table
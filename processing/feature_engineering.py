@@ -1,35 +1,49 @@
+import numpy as np
 import pandas as pd
 
-def team_averages(df):
+# Columnas por equipo en formato largo (una fila por equipo y partido)
+LONG_COLUMNS = ["goals", "xG", "ppda", "deep_completions"]
 
-    df = df.reset_index()
 
-    # Local
-    home_df = pd.DataFrame({
-        "team": df["home_team"],
-        "goals": df["home_goals"],
-        "xG": df["home_xg"],
-        "ppda": df["home_ppda"],
-        "deep_completions": df["home_deep_completions"],
-        "home": 1
-    })
+def to_long_format(df):
+    """
+    One row per team and match from the wide home/away team_match_stats.
 
-    # Visitante
-    away_df = pd.DataFrame({
-        "team": df["away_team"],
-        "goals": df["away_goals"],
-        "xG": df["away_xg"],
-        "ppda": df["away_ppda"],
-        "deep_completions": df["away_deep_completions"],
-        "home": 0
+    Home rows come first, then away rows, built in a single frame.
+    """
+
+    df = df.reset_index()
+    n = len(df)
+
+    def stack(home_col, away_col):
+        return np.concatenate([df[home_col].to_numpy(), df[away_col].to_numpy()])
+
+    long_df = pd.DataFrame({
+        "team": stack("home_team", "away_team"),
+        "opponent": stack("away_team", "home_team"),
+        "date": pd.to_datetime(stack("date", "date")),
+        "goals": stack("home_goals", "away_goals"),
+        "xG": stack("home_xg", "away_xg"),
+        "ppda": stack("home_ppda", "away_ppda"),
+        "deep_completions": stack("home_deep_completions", "away_deep_completions"),
+        "goals_against": stack("away_goals", "home_goals"),
+        "xG_against": stack("away_xg", "home_xg"),
+        "home": np.repeat([1, 0], n),
     })
 
-    combined = pd.concat([home_df, away_df])
+    for col in LONG_COLUMNS + ["goals_against", "xG_against"]:
+        long_df[col] = pd.to_numeric(long_df[col], errors="coerce")
+
+    return long_df
+
+
+def team_averages(df):
+
+    combined = to_long_format(df)[["team"] + LONG_COLUMNS + ["home"]]
 
     grouped = combined.groupby("team").mean().reset_index()
     
     league_avg_goals = combined["goals"].mean()
-    print("Columnas\n",df.columns)
 
     print("\nPromedio goles liga:", league_avg_goals)
 
@@ -38,5 +52,3 @@ def team_averages(df):
     grouped["finishing_efficiency"] = grouped["goals"] / grouped["xG"]
 
     return grouped.sort_values("goals", ascending=False)
-
-
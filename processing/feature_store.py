@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+
+from processing.feature_engineering import to_long_format
+
+
+FORM_COLUMNS = ["goals", "xG", "ppda", "deep_completions"]
+
+
+class FormFeatureStore:
+    """
+    Rolling last-N and exponentially weighted form features per team.
+
+    Features on a row include that row's match; point-in-time queries
+    (as_of, features_for_matches) only ever return rows strictly before
+    the requested date, so backtests never see the match being predicted.
+    """
+
+    def __init__(self, windows=(5, 10), halflife=5, columns=FORM_COLUMNS):
+        self.windows = tuple(windows)
+        self.halflife = halflife
+        self.columns = list(columns)
+        self._teams = {}
+
+    # ==================== CONSTRUCCIÓN ====================
+
+    @property
+    def feature_columns(self):
+        names = []
+        for window in self.windows:
+            names += [f"{col}_last{window}" for col in self.columns]
+            names.append(f"finishing_efficiency_last{window}")
+        names += [f"{col}_ewm" for col in self.columns + ["goals_sum", "xG_sum"]]
+        names.append("finishing_efficiency_ewm")
+        return names
+
+    def _compute(self, long_df, seed=None, history_rows=0):
+        """
+        Features for a long-format frame sorted by (team, date).
+
+        For an append, the first history_rows rows are already-stored
+        matches that only feed the rolling windows, and seed holds the
+        team's last EWM state so the recurrence continues from it.
+        """
+        features = long_df.copy()
+        grouped = features.groupby("team", sort=False)
+
+        for window in self.windows:
+            rolled = grouped[self.columns].rolling(window, min_periods=1).mean()
+            rolled = rolled.reset_index(level=0, drop=True)
+            for col in self.columns:
+                features[f"{col}_last{window}"] = rolled[col]
+
+            # Eficiencia = goles / xG acumulados en la ventana (no media de ratios)
+            sums = grouped[["goals", "xG"]].rolling(window, min_periods=1).sum()
+            sums = sums.reset_index(level=0, drop=True)
+            features[f"finishing_efficiency_last{window}"] = sums["goals"] / sums["xG"]
+
+        ewm_input = features[["team"] + self.columns].iloc[history_rows:].copy()
+        ewm_input["goals_sum"] = ewm_input["goals"]
+        ewm_input["xG_sum"] = ewm_input["xG"]
+        ewm_columns = self.columns + ["goals_sum", "xG_sum"]
+
+        if seed is not None:
+            # La fila semilla es el último estado EWM guardado
+            seed_rows = seed[["team"] + [f"{col}_ewm" for col in ewm_columns]]
+            seed_rows.columns = ["team"] + ewm_columns
+            ewm_input = pd.concat([seed_rows, ewm_input])
+
+        ewm = (
+            ewm_input.groupby("team", sort=False)[ewm_columns]
+            .ewm(halflife=self.halflife, adjust=False)
+            .mean()
+            .reset_index(level=0, drop=True)
+        )
+
+        if seed is not None:
+            ewm = ewm.iloc[len(seed):]
+
+        for col in ewm_columns:
+            features[f"{col}_ewm"] = np.nan
+            features.iloc[history_rows:, features.columns.get_loc(f"{col}_ewm")] = ewm[col].to_numpy()
+
+        features["finishing_efficiency_ewm"] = features["goals_sum_ewm"] / features["xG_sum_ewm"]
+
+        return features
+
+    def fit(self, team_match_stats):
+        """Build the store from scratch from Understat team_match_stats."""
+        long_df = self._prepare(to_long_format(team_match_stats))
+        features = self._compute(long_df)
+
+        self._teams = {
+            team: frame.reset_index(drop=True)
+            for team, frame in features.groupby("team", sort=False)
+        }
+        return self
+
+    @staticmethod
+    def _prepare(long_df):
+        # Orden estable por equipo y fecha; el índice posicional se reasigna
+        long_df = long_df.sort_values(["team", "date"], kind="stable")
+        return long_df.reset_index(drop=True)
+
+    def append(self, new_matches):
+        """
+        Add newly played matches (same wide format as team_match_stats).
+
+        Only the affected teams are touched: their rolling windows are
+        recomputed from the last max(windows) rows and their EWM continues
+        from the stored state. A team whose new matches are not all after
+        its latest stored match is recomputed from its full history.
+        """
+        long_df = self._prepare(to_long_format(new_matches))
+
+        for team, new_rows in long_df.groupby("team", sort=False):
+            cached = self._teams.get(team)
+
+            if cached is not None:
+                known = set(zip(cached["date"], cached["opponent"]))
+                is_new = [key not in known for key in zip(new_rows["date"], new_rows["opponent"])]
+                new_rows = new_rows[is_new]
+
+            if new_rows.empty:
+                continue
+
+            if cached is None:
+                self._teams[team] = self._compute(new_rows).reset_index(drop=True)
+                continue
+
+            if new_rows["date"].min() <= cached["date"].max():
+                raw = self._prepare(pd.concat([cached[long_df.columns], new_rows]))
+                self._teams[team] = self._compute(raw).reset_index(drop=True)
+                continue
+
+            history = cached[long_df.columns].tail(max(self.windows) - 1)
+            window_input = pd.concat([history, new_rows], ignore_index=True)
+
+            updated = self._compute(window_input, seed=cached.tail(1), history_rows=len(history))
+            updated = updated.iloc[len(history):]
+
+            self._teams[team] = pd.concat([cached, updated], ignore_index=True)
+
+        return self
+
+    # ==================== CONSULTAS ====================
+
+    @property
+    def teams(self):
+        return list(self._teams)
+
+    def team_features(self, team):
+        """All stored rows for one team, oldest first."""
+        return self._teams.get(team)
+
+    def table(self):
+        """All teams' rows in one long-format frame."""
+        if not self._teams:
+            return pd.DataFrame()
+        return pd.concat(self._teams.values(), ignore_index=True)
+
+    def as_of(self, team, date):
+        """
+        Form features of a team using only matches played before `date`.
+
+        Returns a Series, or None if the team has no earlier matches.
+        """
+        frame = self._teams.get(team)
+        if frame is None:
+            return None
+
+        position = np.searchsorted(frame["date"].to_numpy(), np.datetime64(pd.Timestamp(date)), side="left")
+        if position == 0:
+            return None
+
+        return frame.iloc[position - 1][self.feature_columns]
+
+    def features_for_matches(self, matches):
+        """
+        Point-in-time features for a table of matches (home_team,
+        away_team, date), as home_* and away_* columns.
+
+        Each side gets its latest features from matches strictly before
+        the match date, so the result can be used directly in backtests.
+        """
+        matches = matches.reset_index(drop=True)
+        dates = pd.to_datetime(matches["date"])
+
+        table = self.table()[["team", "date"] + self.feature_columns].sort_values("date")
+
+        result = matches.copy()
+
+        for side in ("home", "away"):
+            query = pd.DataFrame({
+                "_row": np.arange(len(matches)),
+                "team": matches[f"{side}_team"].to_numpy(),
+                "date": dates.to_numpy(),
+            }).sort_values("date")
+
+            # allow_exact_matches=False: el propio partido nunca entra
+            joined = pd.merge_asof(
+                query, table,
+                on="date", by="team",
+                direction="backward",
+                allow_exact_matches=False
+            ).sort_values("_row")
+
+            for col in self.feature_columns:
+                result[f"{side}_{col}"] = joined[col].to_numpy()
+
+        return result
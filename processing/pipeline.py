@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_CACHE_DIR = "data/pipeline_cache"
+
+# Salidas guardadas por etapa (las usadas más recientemente)
+DEFAULT_KEEP = 3
+
+_MISSING = object()
+
+
+def fingerprint(value, decimals=None):
+    """
+    Content hash of a stage input or output.
+
+    DataFrames, Series and arrays are hashed by content (floats rounded
+    to `decimals` when given, so changes below that tolerance keep the
+    same fingerprint); dicts, lists and tuples recursively; anything
+    else through pickle.
+    """
+    digest = hashlib.sha256()
+    _update(digest, value, decimals)
+    return digest.hexdigest()[:16]
+
+
+def _update(digest, value, decimals):
+    if isinstance(value, pd.DataFrame):
+        digest.update(b"frame")
+        digest.update(repr(list(value.columns)).encode())
+        for name in value.columns:
+            _update(digest, value[name], decimals)
+        digest.update(pd.util.hash_pandas_object(value.index).to_numpy().tobytes())
+
+    elif isinstance(value, pd.Series):
+        digest.update(b"series")
+        if decimals is not None and pd.api.types.is_float_dtype(value):
+            value = value.round(decimals)
+        try:
+            digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+        except TypeError:
+            # Celdas no hashables (listas, dicts)
+            digest.update(pickle.dumps(value.tolist()))
+
+    elif isinstance(value, np.ndarray):
+        digest.update(f"array{value.dtype}{value.shape}".encode())
+        if value.dtype == object:
+            digest.update(pd.util.hash_array(value.ravel()).tobytes())
+        else:
+            if decimals is not None and np.issubdtype(value.dtype, np.floating):
+                value = np.round(value, decimals)
+            digest.update(np.ascontiguousarray(value).tobytes())
+
+    elif isinstance(value, dict):
+        digest.update(b"dict")
+        for key in sorted(value, key=repr):
+            digest.update(repr(key).encode())
+            _update(digest, value[key], decimals)
+
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _update(digest, item, decimals)
+
+    elif isinstance(value, float) and decimals is not None:
+        digest.update(repr(round(value, decimals)).encode())
+
+    elif isinstance(value, (str, int, float, bool, type(None), np.generic)):
+        digest.update(repr(value).encode())
+
+    else:
+        digest.update(pickle.dumps(value))
+
+
+class Stage:
+    """
+    One named step: func(*input_values, **params).
+
+    decimals is the tolerance used to fingerprint the stage output, so
+    downstream stages only rerun when it changes beyond that precision.
+    A volatile stage (e.g. a scraper) is re-executed on every refresh.
+    """
+
+    def __init__(self, name, func, inputs=(), params=None, decimals=None, volatile=False):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.params = dict(params or {})
+        self.decimals = decimals
+        self.volatile = volatile
+
+
+class Pipeline:
+    """
+    DAG of stages memoized on disk.
+
+    A stage's key is the hash of its name, params and the output
+    fingerprints of its inputs; its output is pickled under that key.
+    run() only executes stages whose key has no stored output, so a
+    refresh recomputes exactly the stages downstream of a real change.
+
+    Each stage keeps its `keep` most recently used outputs; older keys
+    are evicted from the manifest and their pickles deleted.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, keep=DEFAULT_KEEP):
+        self.cache_dir = cache_dir
+        self.keep = keep
+        self.stages = {}
+        self.executed = []
+        self._values = {}
+        self._keys = {}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._manifest_path = os.path.join(cache_dir, "manifest.json")
+        self._manifest = self._load_manifest()
+
+    # ==================== DEFINICIÓN ====================
+
+    def add(self, name, func, inputs=(), params=None, decimals=None, volatile=False):
+        """Register a stage; its inputs must already be registered."""
+        missing = [stage for stage in inputs if stage not in self.stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {missing}")
+
+        self.stages[name] = Stage(name, func, inputs, params, decimals, volatile)
+        return self
+
+    def set_params(self, name, **params):
+        """Change params of a stage (its key, and its dependents', change with them)."""
+        self.stages[name].params.update(params)
+        self._forget(name)
+
+    def _forget(self, name):
+        # Quita de memoria la etapa y todo lo que depende de ella
+        self._values.pop(name, None)
+        self._keys.pop(name, None)
+        for stage in self.stages.values():
+            if name in stage.inputs and stage.name in self._keys:
+                self._forget(stage.name)
+
+    # ==================== EJECUCIÓN ====================
+
+    def run(self, targets=None, refresh=False):
+        """
+        Compute the requested stages (all by default) and their inputs.
+
+        refresh=True re-executes volatile stages; everything downstream
+        is then reused from disk unless its input fingerprints changed.
+
+        Returns dict stage name -> output.
+        """
+        if refresh:
+            for stage in self.stages.values():
+                if stage.volatile:
+                    self._forget(stage.name)
+
+        self.executed = []
+        targets = list(self.stages) if targets is None else list(targets)
+
+        return {name: self._resolve(name) for name in targets}
+
+    def _stage_key(self, stage):
+        return fingerprint({
+            "name": stage.name,
+            "params": stage.params,
+            "inputs": [self._manifest[self._keys[name]]["output"] for name in stage.inputs],
+        })
+
+    def _resolve(self, name):
+        if name in self._values:
+            return self._values[name]
+
+        stage = self.stages[name]
+        args = [self._resolve(dependency) for dependency in stage.inputs]
+
+        if stage.volatile:
+            # Una fuente siempre se vuelve a leer; su clave es su contenido
+            # y solo se guarda su huella, no el valor
+            value = stage.func(*args, **stage.params)
+            output = fingerprint(value, stage.decimals)
+            key = fingerprint({"name": stage.name, "output": output})
+            self.executed.append(name)
+            self._record(name, key, output)
+        else:
+            key = self._stage_key(stage)
+            value = self._load(key)
+            if value is _MISSING:
+                value = stage.func(*args, **stage.params)
+                self.executed.append(name)
+                self._store(name, key, value, fingerprint(value, stage.decimals))
+            else:
+                # Reutilizada: pasa a ser la más reciente de su etapa
+                self._record(name, key, self._manifest[key]["output"])
+
+        self._keys[name] = key
+        self._values[name] = value
+        return value
+
+    # ==================== CACHÉ EN DISCO ====================
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _load_manifest(self):
+        if not os.path.exists(self._manifest_path):
+            return {}
+        with open(self._manifest_path) as f:
+            return json.load(f)
+
+    def _load(self, key):
+        if key not in self._manifest or not os.path.exists(self._path(key)):
+            return _MISSING
+        with open(self._path(key), "rb") as f:
+            return pickle.load(f)
+
+    def _store(self, stage, key, value, output):
+        with open(self._path(key), "wb") as f:
+            pickle.dump(value, f)
+
+        self._record(stage, key, output)
+
+    def _record(self, stage, key, output):
+        # El manifiesto conserva el orden de uso: la última entrada es la más reciente
+        self._manifest.pop(key, None)
+        self._manifest[key] = {"stage": stage, "output": output}
+        self._evict(stage)
+
+        with open(self._manifest_path, "w") as f:
+            json.dump(self._manifest, f)
+
+    def _evict(self, stage):
+        keys = [key for key, entry in self._manifest.items() if entry["stage"] == stage]
+        for key in keys[:-self.keep]:
+            del self._manifest[key]
+            if os.path.exists(self._path(key)):
+                os.remove(self._path(key))
+
+    def clear(self):
+        """Delete every stored output."""
+        for key in self._manifest:
+            if os.path.exists(self._path(key)):
+                os.remove(self._path(key))
+        self._manifest = {}
+        self._values = {}
+        self._keys = {}
+        if os.path.exists(self._manifest_path):
+            os.remove(self._manifest_path)
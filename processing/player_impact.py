@@ -0,0 +1,277 @@
+import logging
+import numpy as np
+import pandas as pd
+
+from processing.fbref_tables import flatten_columns
+
+
+# Columnas candidatas tras aplanar las tablas de jugadores de FBref
+MINUTES_COLUMNS = ["min", "playing time_min", "minutes", "minutes_played"]
+XG_COLUMNS = ["expected_xg", "xg"]
+XA_COLUMNS = ["expected_xag", "xag", "expected_xa", "xa"]
+POSITION_COLUMNS = ["pos", "position"]
+
+# Posiciones que cuentan para la continuidad defensiva
+DEFENSIVE_POSITIONS = r"GK|DF"
+
+PLAYER_IMPACT_COLUMNS = [
+    "team", "player", "position", "minutes", "xg", "xa",
+    "minutes_share", "contribution_share", "rate_per90",
+]
+
+
+def _pick(columns, candidates):
+    for name in candidates:
+        if name in columns:
+            return name
+    return None
+
+
+def player_contributions(player_stats):
+    """
+    Per-player totals (minutes, xG, xA) from FBref player match or season
+    stats, one row per (team, player).
+    """
+
+    stats = flatten_columns(player_stats.reset_index())
+
+    minutes_col = _pick(stats.columns, MINUTES_COLUMNS)
+    if minutes_col is None:
+        raise ValueError("Player stats have no minutes column")
+
+    xg_col = _pick(stats.columns, XG_COLUMNS)
+    xa_col = _pick(stats.columns, XA_COLUMNS)
+    position_col = _pick(stats.columns, POSITION_COLUMNS)
+
+    def numeric(col):
+        if col is None:
+            return 0.0
+        return pd.to_numeric(stats[col], errors="coerce").fillna(0).to_numpy()
+
+    players = pd.DataFrame({
+        "team": stats["team"].to_numpy(),
+        "player": stats["player"].to_numpy(),
+        "position": stats[position_col].fillna("").astype(str).to_numpy() if position_col else "",
+        "minutes": numeric(minutes_col),
+        "xg": numeric(xg_col),
+        "xa": numeric(xa_col),
+    })
+
+    return players.groupby(["team", "player"], sort=False).agg(
+        position=("position", "first"),
+        minutes=("minutes", "sum"),
+        xg=("xg", "sum"),
+        xa=("xa", "sum"),
+    ).reset_index()
+
+
+class PlayerImpactTable:
+    """
+    Indexed table of each player's minutes share and xG+xA contribution.
+
+    Built once from FBref player stats; afterwards every lookup is an
+    integer gather plus a bincount, so adjusting a full matchday of
+    lineups takes milliseconds.
+
+    - minutes_share: player minutes / team match minutes (1 = every minute)
+    - rate_per90: (xG + xA) per 90, shrunk towards the team's average
+      per-slot rate by prior_90s of pseudo-minutes
+    """
+
+    def __init__(self, prior_90s=5.0, defense_sensitivity=0.15, bounds=(0.7, 1.3)):
+        self.prior_90s = prior_90s
+        self.defense_sensitivity = defense_sensitivity
+        self.bounds = bounds
+        self.standardize = None
+        self.table = pd.DataFrame(columns=PLAYER_IMPACT_COLUMNS)
+        self.logger = logging.getLogger(__name__)
+
+    # ==================== CONSTRUCCIÓN ====================
+
+    def fit(self, player_stats, standardize=None):
+        """
+        Args:
+            player_stats: FBref player match stats (or season stats)
+            standardize: Optional team-name mapper (e.g.
+                DataHub.standardize_team_name), also applied to the
+                lineups passed to lineup_multipliers
+        """
+        players = player_contributions(player_stats)
+
+        self.standardize = standardize
+        players["team"] = _standardize_teams(players["team"], standardize)
+
+        team_codes, teams = pd.factorize(players["team"])
+        n_teams = len(teams)
+
+        contribution = (players["xg"] + players["xa"]).to_numpy()
+        minutes = players["minutes"].to_numpy()
+
+        # Minutos de partido del equipo = minutos de sus jugadores / 11
+        team_minutes = np.bincount(team_codes, weights=minutes, minlength=n_teams) / 11
+        team_contribution = np.bincount(team_codes, weights=contribution, minlength=n_teams)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Ritmo medio por puesto en el once (por 90 minutos)
+            slot_rate = np.where(team_minutes > 0, team_contribution / (team_minutes / 90) / 11, 0.0)
+
+            players["minutes_share"] = np.where(
+                team_minutes[team_codes] > 0, minutes / team_minutes[team_codes], 0.0
+            )
+            players["contribution_share"] = np.where(
+                team_contribution[team_codes] > 0, contribution / team_contribution[team_codes], 0.0
+            )
+
+        players["rate_per90"] = (
+            (contribution + self.prior_90s * slot_rate[team_codes]) /
+            (minutes / 90 + self.prior_90s)
+        )
+
+        self.table = players[PLAYER_IMPACT_COLUMNS].reset_index(drop=True)
+        self._index(teams, team_codes, slot_rate)
+
+        return self
+
+    def _index(self, teams, team_codes, slot_rate):
+        self.teams = pd.Index(teams)
+        self._player_index = pd.MultiIndex.from_frame(self.table[["team", "player"]])
+
+        self._team_codes = team_codes
+        self._rates = self.table["rate_per90"].to_numpy()
+        self._shares = self.table["minutes_share"].to_numpy()
+        self._defensive = self.table["position"].str.contains(DEFENSIVE_POSITIONS, na=False).to_numpy()
+        self._slot_rate = slot_rate
+
+        # Once de referencia por equipo: los 11 con más minutos
+        ranks = self.table.groupby("team", sort=False)["minutes"].rank(method="first", ascending=False)
+        regular = (ranks <= 11).to_numpy()
+        n_teams = len(teams)
+
+        self._baseline_attack = np.bincount(
+            team_codes, weights=self._rates * self._shares, minlength=n_teams
+        )
+        self._baseline_defense = self._defensive_share(team_codes[regular], np.flatnonzero(regular), n_teams)
+
+    def _defensive_share(self, team_codes, rows, n_teams):
+        # Continuidad: suma de minutes_share de porteros/defensas (o de todos si no hay posiciones)
+        weights = self._shares[rows]
+        if self._defensive.any():
+            weights = weights * self._defensive[rows]
+        return np.bincount(team_codes, weights=weights, minlength=n_teams)
+
+    # ==================== CONSULTAS ====================
+
+    def players(self, team):
+        """All rows of one team, most minutes first."""
+        return self.table[self.table["team"] == team].sort_values("minutes", ascending=False)
+
+    def lineup_multipliers(self, lineups):
+        """
+        Attack and defence multipliers for a set of lineups.
+
+        Args:
+            lineups: DataFrame with team and player columns (one row per
+                player in the XI), e.g. the starters from get_lineups, or
+                a dict team -> list of players. Team names go through
+                the mapper given to fit(); unknown teams are logged and
+                skipped
+
+        Returns:
+            DataFrame indexed by team with attack_multiplier (expected
+            xG+xA of the XI vs the team's usual output) and
+            defense_multiplier (> 1 when regular defenders are missing)
+        """
+        if isinstance(lineups, dict):
+            lineups = pd.DataFrame(
+                [(team, player) for team, players in lineups.items() for player in players],
+                columns=["team", "player"]
+            )
+
+        lineup_teams = _standardize_teams(lineups["team"], self.standardize)
+        team_codes = self.teams.get_indexer(lineup_teams)
+        valid = team_codes >= 0
+
+        if not valid.all():
+            unknown = sorted(set(lineup_teams[~valid]))
+            self.logger.warning(f"Equipos sin estadísticas de jugadores, se ignoran: {unknown}")
+
+        team_codes = team_codes[valid]
+        players = pd.DataFrame({
+            "team": lineup_teams[valid],
+            "player": lineups["player"].to_numpy()[valid],
+        })
+
+        rows = self._player_index.get_indexer(pd.MultiIndex.from_frame(players[["team", "player"]]))
+        found = rows >= 0
+        n_teams = len(self.teams)
+
+        # Jugadores sin historial: ritmo medio por puesto del equipo
+        rates = np.where(found, self._rates[np.where(found, rows, 0)], self._slot_rate[team_codes])
+        attack = np.bincount(team_codes, weights=rates, minlength=n_teams)
+        defense = self._defensive_share(team_codes[found], rows[found], n_teams)
+
+        present = np.bincount(team_codes, minlength=n_teams) > 0
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            attack_multiplier = np.where(
+                self._baseline_attack > 0, attack / self._baseline_attack, 1.0
+            )
+            continuity = np.where(
+                self._baseline_defense > 0, defense / self._baseline_defense, 1.0
+            )
+
+        defense_multiplier = 1 + self.defense_sensitivity * (1 - np.minimum(continuity, 1.0))
+
+        low, high = self.bounds
+        return pd.DataFrame({
+            "attack_multiplier": np.clip(attack_multiplier, low, high)[present],
+            "defense_multiplier": np.clip(defense_multiplier, low, high)[present],
+        }, index=pd.Index(self.teams[present], name="team"))
+
+
+def _standardize_teams(teams, standardize):
+    # Mapea cada nombre distinto una sola vez
+    teams = pd.Series(teams)
+    if standardize is not None:
+        teams = teams.map({team: standardize(team) for team in teams.unique()})
+    return teams.to_numpy()
+
+
+def adjust_strengths(team_stats, multipliers):
+    """
+    Apply lineup multipliers (see PlayerImpactTable.lineup_multipliers)
+    to the strength columns used by calculate_lambdas. Teams without a
+    lineup keep their strengths.
+    """
+
+    adjusted = team_stats.copy()
+
+    attack = adjusted["team"].map(multipliers["attack_multiplier"]).fillna(1.0).to_numpy()
+    defense = adjusted["team"].map(multipliers["defense_multiplier"]).fillna(1.0).to_numpy()
+
+    for col in ("home_attack_strength", "away_attack_strength"):
+        adjusted[col] = adjusted[col] * attack
+    for col in ("home_defense_strength", "away_defense_strength"):
+        adjusted[col] = adjusted[col] * defense
+
+    return adjusted
+
+
+def starting_lineups(lineups, game=None, standardize=None):
+    """
+    Starters (team, player) from FBref get_lineups, optionally for a
+    single game, with team names passed through standardize (e.g.
+    DataHub.standardize_team_name) when given.
+    """
+
+    lineups = flatten_columns(lineups.reset_index())
+
+    if game is not None:
+        lineups = lineups[lineups["game"] == game]
+    if "is_starter" in lineups.columns:
+        lineups = lineups[lineups["is_starter"].astype(bool)]
+
+    lineups = lineups[["team", "player"]].reset_index(drop=True)
+    lineups["team"] = _standardize_teams(lineups["team"], standardize)
+
+    return lineups
@@ -0,0 +1,206 @@
+import os
+import numpy as np
+import pandas as pd
+
+from processing.fbref_tables import flatten_columns
+
+
+# Umbral de xG para considerar un tiro como "ocasión clara"
+BIG_CHANCE_XG = 0.3
+
+SHOT_AGGREGATE_COLUMNS = [
+    "game", "date", "team",
+    "np_xg", "shots", "big_chances", "big_chance_share", "set_piece_xg"
+]
+
+DEFAULT_STORE_PATH = "data/shot_aggregates.csv"
+
+# Columnas de ratio: sin tiros no tienen valor (se quedan NaN, no 0)
+SHOT_RATIO_COLUMNS = ["big_chance_share"]
+
+
+def _text_flag(shots, columns, pattern):
+    flag = np.zeros(len(shots), dtype=bool)
+
+    for col in columns:
+        if col in shots.columns:
+            flag |= shots[col].astype(str).str.contains(pattern, case=False, na=False).to_numpy()
+
+    return flag
+
+
+def aggregate_shots(shots):
+    """
+    Per-team, per-match aggregates from a chunk of FBref shot events:
+    - Non-penalty xG
+    - Shots and big-chance share
+    - Set-piece xG
+    """
+
+    shots = flatten_columns(shots.reset_index())
+
+    xg = pd.to_numeric(shots["xg"], errors="coerce").fillna(0).to_numpy()
+
+    is_penalty = _text_flag(shots, ["player", "notes"], r"\(pen\)|penalty")
+    is_set_piece = _text_flag(shots, ["sca 1_event", "notes"], r"dead|free kick|corner")
+
+    flags = pd.DataFrame({
+        "game": shots["game"].to_numpy(),
+        "team": shots["team"].to_numpy(),
+        "np_xg": np.where(is_penalty, 0.0, xg),
+        "shots": 1,
+        "big_chances": ((xg >= BIG_CHANCE_XG) & ~is_penalty).astype(int),
+        "set_piece_xg": np.where(is_set_piece & ~is_penalty, xg, 0.0),
+    })
+
+    aggregates = flags.groupby(["game", "team"], sort=False).sum().reset_index()
+
+    aggregates["big_chance_share"] = aggregates["big_chances"] / aggregates["shots"]
+
+    # El id de partido de FBref empieza por la fecha: "2023-08-11 Burnley-Manchester City"
+    aggregates["date"] = pd.to_datetime(aggregates["game"].str[:10], errors="coerce")
+
+    return aggregates[SHOT_AGGREGATE_COLUMNS]
+
+
+def iter_match_chunks(shots, matches_per_chunk=50):
+    """
+    Yield shot events in chunks of whole matches.
+
+    Accepts a DataFrame or any iterable of DataFrames (e.g. one per
+    matchday), so the full event table never has to be held at once.
+    """
+
+    if isinstance(shots, pd.DataFrame):
+        shots = [shots]
+
+    for frame in shots:
+        if frame is None or frame.empty:
+            continue
+
+        games = frame.index.get_level_values("game") if "game" in frame.index.names else frame["game"]
+        codes, uniques = pd.factorize(games)
+
+        for start in range(0, len(uniques), matches_per_chunk):
+            mask = (codes >= start) & (codes < start + matches_per_chunk)
+            yield frame[mask]
+
+
+class ShotAggregateStore:
+    """
+    Local append-only CSV store of shot aggregates (one row per team-match).
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=SHOT_AGGREGATE_COLUMNS)
+
+        stored = pd.read_csv(self.path, parse_dates=["date"])
+
+        # Si un partido se reprocesa, manda la última versión
+        return stored.drop_duplicates(["game", "team"], keep="last").reset_index(drop=True)
+
+    def processed_games(self):
+        if not os.path.exists(self.path):
+            return set()
+
+        return set(pd.read_csv(self.path, usecols=["game"])["game"])
+
+    def append(self, aggregates):
+        if aggregates.empty:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        write_header = not os.path.exists(self.path)
+        aggregates[SHOT_AGGREGATE_COLUMNS].to_csv(
+            self.path, mode="a", header=write_header, index=False
+        )
+
+
+def build_shot_aggregates(shots, store=None, matches_per_chunk=50, skip_processed=True):
+    """
+    Stream shot events through aggregate_shots chunk by chunk.
+
+    Each chunk's aggregates are appended to the store as soon as they are
+    computed. Games already in the store are skipped unless skip_processed
+    is False.
+    """
+
+    processed = store.processed_games() if (store is not None and skip_processed) else set()
+
+    results = []
+
+    for chunk in iter_match_chunks(shots, matches_per_chunk):
+        aggregates = aggregate_shots(chunk)
+
+        if processed:
+            aggregates = aggregates[~aggregates["game"].isin(processed)]
+
+        if store is not None:
+            store.append(aggregates)
+
+        results.append(aggregates)
+
+    if not results:
+        return pd.DataFrame(columns=SHOT_AGGREGATE_COLUMNS)
+
+    return pd.concat(results, ignore_index=True)
+
+
+def join_shot_aggregates(team_match_stats, aggregates, standardize=None):
+    """
+    Add shot aggregates to Understat team_match_stats as extra columns
+    (home_shot_np_xg, away_big_chance_share, ...).
+
+    Matches are joined on date and team. standardize is an optional
+    team-name mapper (e.g. DataHub.standardize_team_name) applied to both
+    sides so FBref and Understat names line up.
+
+    A side with no shots in a match that has shot data (the opponent's
+    row is there) gets 0 in the count columns and NaN in the ratio
+    columns; matches without shot data stay NaN.
+    """
+
+    df = team_match_stats.reset_index()
+    match_dates = pd.to_datetime(df["date"]).dt.normalize()
+
+    aggregates = aggregates.copy()
+    aggregates["date"] = pd.to_datetime(aggregates["date"]).dt.normalize()
+
+    if standardize is not None:
+        aggregates["team"] = aggregates["team"].map(standardize)
+
+    value_columns = [col for col in SHOT_AGGREGATE_COLUMNS if col not in ("game", "date", "team")]
+    aggregates = aggregates.drop_duplicates(["date", "team"], keep="last")
+    aggregates = aggregates.set_index(["date", "team"])[value_columns]
+
+    side_values = {}
+    found = {}
+    for side in ("home", "away"):
+        teams = df[f"{side}_team"]
+        if standardize is not None:
+            teams = teams.map(standardize)
+
+        keys = pd.MultiIndex.from_arrays([match_dates, teams])
+        side_values[side] = aggregates.reindex(keys)
+        found[side] = keys.isin(aggregates.index)
+
+    # Un equipo sin tiros no tiene fila: si el rival la tiene, el partido
+    # sí tiene datos y sus conteos son 0 (los ratios quedan NaN)
+    covered = found["home"] | found["away"]
+    count_columns = [col for col in value_columns if col not in SHOT_RATIO_COLUMNS]
+
+    for side in ("home", "away"):
+        values = side_values[side]
+        values.loc[covered & ~found[side], count_columns] = 0
+
+        for col in value_columns:
+            df[f"{side}_shot_{col}"] = values[col].to_numpy()
+
+    return df
@@ -0,0 +1,48 @@
+# scrapers/async_runner.py
+import asyncio
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# Llamadas simultáneas permitidas por fuente
+SOURCE_CONCURRENCY: Dict[str, int] = {
+    "understat": 1,
+    "fbref": 1,  # un solo navegador (Selenium) por scraper
+    "sofascore": 2,
+}
+
+DEFAULT_CONCURRENCY = 2
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="scraper")
+
+# Los semáforos de asyncio pertenecen a un event loop, así que se guardan por loop
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_semaphore(source: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    loop_semaphores = _semaphores.setdefault(loop, {})
+
+    if source not in loop_semaphores:
+        limit = SOURCE_CONCURRENCY.get(source, DEFAULT_CONCURRENCY)
+        loop_semaphores[source] = asyncio.Semaphore(limit)
+
+    return loop_semaphores[source]
+
+
+async def run_blocking(source: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking scraper call in the shared executor
+
+    Args:
+        source: Source name used to pick the semaphore (e.g. 'fbref')
+        func: Blocking callable
+    """
+    async with _get_semaphore(source):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _executor, functools.partial(func, *args, **kwargs)
+        )
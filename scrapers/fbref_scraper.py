@@ -4,27 +4,43 @@ import pandas as pd
 import logging
 from typing import Optional, Dict, List, Union
 
+from scrapers.async_runner import run_blocking
+from scrapers.request_scheduler import (
+    FBREF_HOST, PRIORITY_INTERACTIVE, RequestScheduler, get_scheduler
+)
+
 class FBrefScraper:
     """
     Wrapper for soccerdata.FBref scraper
     """
     
-    def __init__(self, league: str, season: str = "2324"):
+    def __init__(self, league: str, season: str = "2324",
+                 scheduler: Optional[RequestScheduler] = None,
+                 priority: int = PRIORITY_INTERACTIVE):
         """
         Initialize FBref scraper
         
         Args:
             league: League code (e.g., 'ENG-Premier League')
             season: Season code (e.g., '2324' for 2023-24)
+            scheduler: Request scheduler (defaults to the shared one)
+            priority: Queue priority for this wrapper's requests
+                (PRIORITY_INTERACTIVE or PRIORITY_BULK)
         """
         self.league = league
         self.season = season
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
+        self.priority = priority
         self.scraper = sd.FBref(leagues=[league], seasons=[season])
+    
+    def _request(self, func, *args, **kwargs):
+        """Run a soccerdata call through the scheduler (rate limit + retries)"""
+        return self.scheduler.call(FBREF_HOST, func, *args, priority=self.priority, **kwargs)
         
     def get_schedule(self) -> Optional[pd.DataFrame]:
         """Get match schedule"""
         try:
-            return self.scraper.read_schedule()
+            return self._request(self.scraper.read_schedule)
         except Exception as e:
             logging.error(f"Error getting schedule from FBref: {e}")
             return None
@@ -37,7 +53,7 @@ class FBrefScraper:
             stat_type: Type of statistics ('standard', 'shooting', 'passing', 'defense', 'possession', 'keeper')
         """
         try:
-            return self.scraper.read_team_season_stats(stat_type=stat_type)
+            return self._request(self.scraper.read_team_season_stats, stat_type=stat_type)
         except Exception as e:
             logging.error(f"Error getting team season stats from FBref: {e}")
             return None
@@ -45,7 +61,7 @@ class FBrefScraper:
     def get_team_match_stats(self) -> Optional[pd.DataFrame]:
         """Get team match statistics"""
         try:
-            return self.scraper.read_team_match_stats()
+            return self._request(self.scraper.read_team_match_stats)
         except Exception as e:
             logging.error(f"Error getting team match stats from FBref: {e}")
             return None
@@ -53,7 +69,7 @@ class FBrefScraper:
     def get_player_season_stats(self, stat_type: str = "standard") -> Optional[pd.DataFrame]:
         """Get player season statistics"""
         try:
-            return self.scraper.read_player_season_stats(stat_type=stat_type)
+            return self._request(self.scraper.read_player_season_stats, stat_type=stat_type)
         except Exception as e:
             logging.error(f"Error getting player season stats from FBref: {e}")
             return None
@@ -61,15 +77,20 @@ class FBrefScraper:
     def get_player_match_stats(self) -> Optional[pd.DataFrame]:
         """Get player match statistics"""
         try:
-            return self.scraper.read_player_match_stats()
+            return self._request(self.scraper.read_player_match_stats)
         except Exception as e:
             logging.error(f"Error getting player match stats from FBref: {e}")
             return None
     
-    def get_shot_events(self) -> Optional[pd.DataFrame]:
-        """Get shot events"""
+    def get_shot_events(self, match_id: Optional[Union[str, List[str]]] = None) -> Optional[pd.DataFrame]:
+        """
+        Get shot events
+        
+        Args:
+            match_id: FBref game_id(s) to fetch (defaults to the whole season)
+        """
         try:
-            return self.scraper.read_shot_events()
+            return self._request(self.scraper.read_shot_events, match_id=match_id)
         except Exception as e:
             logging.error(f"Error getting shot events from FBref: {e}")
             return None
@@ -77,7 +98,37 @@ class FBrefScraper:
     def get_lineups(self) -> Optional[pd.DataFrame]:
         """Get lineups"""
         try:
-            return self.scraper.read_lineup()
+            return self._request(self.scraper.read_lineup)
         except Exception as e:
             logging.error(f"Error getting lineups from FBref: {e}")
-            return None
\ No newline at end of file
+            return None
+    
+    # ==================== ASYNC ====================
+    
+    async def aget_schedule(self) -> Optional[pd.DataFrame]:
+        """Async version of get_schedule"""
+        return await run_blocking("fbref", self.get_schedule)
+    
+    async def aget_team_season_stats(self, stat_type: str = "standard") -> Optional[pd.DataFrame]:
+        """Async version of get_team_season_stats"""
+        return await run_blocking("fbref", self.get_team_season_stats, stat_type)
+    
+    async def aget_team_match_stats(self) -> Optional[pd.DataFrame]:
+        """Async version of get_team_match_stats"""
+        return await run_blocking("fbref", self.get_team_match_stats)
+    
+    async def aget_player_season_stats(self, stat_type: str = "standard") -> Optional[pd.DataFrame]:
+        """Async version of get_player_season_stats"""
+        return await run_blocking("fbref", self.get_player_season_stats, stat_type)
+    
+    async def aget_player_match_stats(self) -> Optional[pd.DataFrame]:
+        """Async version of get_player_match_stats"""
+        return await run_blocking("fbref", self.get_player_match_stats)
+    
+    async def aget_shot_events(self, match_id: Optional[Union[str, List[str]]] = None) -> Optional[pd.DataFrame]:
+        """Async version of get_shot_events"""
+        return await run_blocking("fbref", self.get_shot_events, match_id)
+    
+    async def aget_lineups(self) -> Optional[pd.DataFrame]:
+        """Async version of get_lineups"""
+        return await run_blocking("fbref", self.get_lineups)
\ No newline at end of file
@@ -0,0 +1,371 @@
+# scrapers/request_scheduler.py
+"""
+Planificador de peticiones compartido por los scrapers
+
+Límites con soccerdata: los wrappers encolan llamadas read_* completas,
+así que el token bucket limita llamadas, no peticiones HTTP (una llamada
+puede descargar muchas páginas, que soccerdata espacia con su propio
+rate_limit/max_delay). soccerdata usa sus propios clientes (tls_requests
+para Understat/Sofascore, Selenium para FBref), por lo que la sesión con
+pool solo la aprovecha get(), para peticiones HTTP directas.
+"""
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Prioridades: número más bajo = se atiende antes
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+# Hosts de cada fuente
+FBREF_HOST = "fbref.com"
+SOFASCORE_HOST = "api.sofascore.com"
+UNDERSTAT_HOST = "understat.com"
+
+# (peticiones por segundo, ráfaga máxima) por host
+DEFAULT_HOST_RATES: Dict[str, Tuple[float, int]] = {
+    FBREF_HOST: (0.15, 2),
+    SOFASCORE_HOST: (1.0, 3),
+    UNDERSTAT_HOST: (1.0, 2),
+}
+
+DEFAULT_RATE = (1.0, 2)
+
+# Llamadas simultáneas máximas por host (sin límite si no aparece).
+# soccerdata.FBref maneja un único Chrome (Selenium) que no es thread-safe
+DEFAULT_HOST_CONCURRENCY: Dict[str, int] = {
+    FBREF_HOST: 1,
+}
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe
+
+    Se recargan `rate` tokens por segundo hasta `capacity`; cada petición
+    consume uno y espera si no queda ninguno.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """
+        Toma un token si hay uno disponible sin esperar
+
+        Returns:
+            0 si lo ha tomado; si no, segundos hasta el siguiente token
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> float:
+        """Bloquea hasta obtener un token. Devuelve el tiempo esperado."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class _Task:
+    __slots__ = ("host", "func", "args", "kwargs", "priority", "future", "attempt")
+
+    def __init__(self, host, func, args, kwargs, priority):
+        self.host = host
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future = Future()
+        self.attempt = 0
+
+
+class RequestScheduler:
+    """
+    Planificador de peticiones compartido por todos los scrapers
+
+    - Token bucket por host
+    - Límite de llamadas simultáneas por host
+    - Sesión HTTP compartida para get() (reutiliza conexiones)
+    - Reintentos con backoff exponencial y jitter
+    - Cola de prioridad: las predicciones interactivas pasan delante de
+      las cargas masivas
+    """
+
+    def __init__(self,
+                 host_rates: Optional[Dict[str, Tuple[float, int]]] = None,
+                 host_concurrency: Optional[Dict[str, int]] = None,
+                 max_retries: int = 4,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 60.0,
+                 n_workers: int = 4,
+                 session: Optional[requests.Session] = None,
+                 timeout: float = 30.0):
+        """
+        Args:
+            host_rates: Dict host -> (peticiones por segundo, ráfaga)
+            host_concurrency: Dict host -> llamadas simultáneas máximas
+            max_retries: Reintentos antes de dar la petición por fallida
+            backoff_base: Espera base en segundos (se duplica en cada intento)
+            backoff_max: Espera máxima en segundos
+            n_workers: Hilos que ejecutan peticiones
+            session: Sesión HTTP a usar (por defecto una nueva con pool)
+            timeout: Timeout por defecto de get()
+        """
+        self.host_rates = dict(DEFAULT_HOST_RATES)
+        if host_rates:
+            self.host_rates.update(host_rates)
+
+        self.host_concurrency = dict(DEFAULT_HOST_CONCURRENCY)
+        if host_concurrency:
+            self.host_concurrency.update(host_concurrency)
+
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.n_workers = n_workers
+        self.timeout = timeout
+
+        self.session = session if session is not None else self._build_session()
+
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._active: Dict[str, int] = {}
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._workers = []
+        self._closed = False
+
+        self.logger = logging.getLogger(__name__)
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self.n_workers * 2)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _bucket(self, host: str) -> TokenBucket:
+        with self._condition:
+            if host not in self._buckets:
+                rate, capacity = self.host_rates.get(host, DEFAULT_RATE)
+                self._buckets[host] = TokenBucket(rate, capacity)
+            return self._buckets[host]
+
+    # ==================== COLA ====================
+
+    def _start_workers(self):
+        # Los hilos se arrancan con la primera petición
+        while len(self._workers) < self.n_workers:
+            worker = threading.Thread(target=self._worker_loop, daemon=True,
+                                      name=f"request-scheduler-{len(self._workers)}")
+            worker.start()
+            self._workers.append(worker)
+
+    def _enqueue(self, task: _Task):
+        with self._condition:
+            if self._closed:
+                task.future.set_exception(RuntimeError("RequestScheduler cerrado"))
+                return
+            heapq.heappush(self._queue, (task.priority, next(self._counter), task))
+            self._start_workers()
+            self._condition.notify()
+
+    def _next_ready(self) -> Tuple[Optional[_Task], Optional[float]]:
+        """
+        Saca la tarea de mayor prioridad cuyo host tiene un token libre
+
+        Las tareas de un host sin tokens, o con todas sus llamadas
+        simultáneas ocupadas, se quedan en la cola sin ocupar un worker
+        ni gastar token. Returns (tarea, None) o (None, segundos hasta el
+        próximo token de algún host en cola).
+        """
+        next_token = None
+        blocked = set()
+
+        for entry in sorted(self._queue):
+            if entry[2].future.cancelled():
+                # Cancelada antes de empezar: fuera de la cola sin gastar token
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                continue
+
+            host = entry[2].host
+            if host in blocked:
+                continue
+
+            limit = self.host_concurrency.get(host)
+            if limit is not None and self._active.get(host, 0) >= limit:
+                # Se despierta al terminar la llamada en curso (_release)
+                blocked.add(host)
+                continue
+
+            wait = self._bucket(host).try_acquire()
+            if wait == 0:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._active[host] = self._active.get(host, 0) + 1
+                return entry[2], None
+
+            blocked.add(host)
+            next_token = wait if next_token is None else min(next_token, wait)
+
+        return None, next_token
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                while True:
+                    task, wait = self._next_ready() if self._queue else (None, None)
+                    if task is not None:
+                        break
+                    # Después de _next_ready: puede haber vaciado la cola de canceladas
+                    if self._closed and not self._queue:
+                        return
+                    self._condition.wait(timeout=wait)
+
+            # Los reintentos ya tienen el future en estado RUNNING
+            try:
+                if task.attempt > 0 or task.future.set_running_or_notify_cancel():
+                    self._run(task)
+            finally:
+                self._release(task.host)
+
+    def _release(self, host: str):
+        with self._condition:
+            self._active[host] -= 1
+            self._condition.notify_all()
+
+    def _run(self, task: _Task):
+        # El token ya se tomó al sacar la tarea de la cola
+        try:
+            result = task.func(*task.args, **task.kwargs)
+        except Exception as e:
+            if task.attempt >= self.max_retries or not self._is_retryable(e):
+                task.future.set_exception(e)
+                return
+
+            delay = self.backoff_delay(task.attempt)
+            task.attempt += 1
+            self.logger.warning(
+                f"Reintento {task.attempt}/{self.max_retries} para {task.host} "
+                f"en {delay:.1f}s: {e}"
+            )
+            # El reintento vuelve a la cola sin bloquear al worker
+            timer = threading.Timer(delay, self._requeue, args=(task,))
+            timer.daemon = True
+            timer.start()
+            return
+
+        task.future.set_result(result)
+
+    def _requeue(self, task: _Task):
+        with self._condition:
+            if self._closed:
+                task.future.set_exception(RuntimeError("RequestScheduler cerrado"))
+                return
+            heapq.heappush(self._queue, (task.priority, next(self._counter), task))
+            self._condition.notify()
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Solo errores de red, timeouts y respuestas 429/5xx"""
+        if isinstance(error, requests.HTTPError):
+            return error.response is not None and error.response.status_code in RETRY_STATUS_CODES
+        return isinstance(error, (requests.ConnectionError, requests.Timeout,
+                                  ConnectionError, TimeoutError))
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Backoff exponencial con jitter completo"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    # ==================== API ====================
+
+    def submit(self, host: str, func: Callable[..., Any], *args,
+               priority: int = PRIORITY_BULK, **kwargs) -> Future:
+        """
+        Encola una llamada bloqueante contra un host
+
+        Args:
+            host: Host al que se hace la petición (decide el token bucket)
+            func: Callable a ejecutar
+            priority: PRIORITY_INTERACTIVE o PRIORITY_BULK
+
+        Returns:
+            Future con el resultado
+        """
+        task = _Task(host, func, args, kwargs, priority)
+        self._enqueue(task)
+        return task.future
+
+    def call(self, host: str, func: Callable[..., Any], *args,
+             priority: int = PRIORITY_BULK, **kwargs) -> Any:
+        """Como submit() pero espera el resultado (relanza el último error)"""
+        return self.submit(host, func, *args, priority=priority, **kwargs).result()
+
+    def get(self, url: str, priority: int = PRIORITY_BULK, **kwargs) -> requests.Response:
+        """
+        GET con la sesión compartida, limitado por el token bucket del host
+
+        Los códigos 429 y 5xx se reintentan con backoff.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+
+        def _get():
+            response = self.session.get(url, **kwargs)
+            response.raise_for_status()
+            return response
+
+        return self.call(urlparse(url).netloc, _get, priority=priority)
+
+    def shutdown(self):
+        """Deja de aceptar peticiones y espera a que se vacíe la cola"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+        self.session.close()
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """Devuelve el planificador compartido por todos los scrapers"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
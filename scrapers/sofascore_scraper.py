@@ -4,27 +4,43 @@ import pandas as pd
 import logging
 from typing import Optional, Dict, List
 
+from scrapers.async_runner import run_blocking
+from scrapers.request_scheduler import (
+    SOFASCORE_HOST, PRIORITY_INTERACTIVE, RequestScheduler, get_scheduler
+)
+
 class SofascoreScraper:
     """
     Wrapper for soccerdata.Sofascore scraper
     """
     
-    def __init__(self, league: str, season: str = "2324"):
+    def __init__(self, league: str, season: str = "2324",
+                 scheduler: Optional[RequestScheduler] = None,
+                 priority: int = PRIORITY_INTERACTIVE):
         """
         Initialize Sofascore scraper
         
         Args:
             league: League code (e.g., 'ENG-Premier League')
             season: Season code (e.g., '2324' for 2023-24)
+            scheduler: Request scheduler (defaults to the shared one)
+            priority: Queue priority for this wrapper's requests
+                (PRIORITY_INTERACTIVE or PRIORITY_BULK)
         """
         self.league = league
         self.season = season
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
+        self.priority = priority
         self.scraper = sd.Sofascore(leagues=[league], seasons=[season])
+    
+    def _request(self, func, *args, **kwargs):
+        """Run a soccerdata call through the scheduler (rate limit + retries)"""
+        return self.scheduler.call(SOFASCORE_HOST, func, *args, priority=self.priority, **kwargs)
         
     def get_league_table(self) -> Optional[pd.DataFrame]:
         """Get current league table"""
         try:
-            return self.scraper.read_league_table()
+            return self._request(self.scraper.read_league_table)
         except Exception as e:
             logging.error(f"Error getting league table from Sofascore: {e}")
             return None
@@ -32,7 +48,7 @@ class SofascoreScraper:
     def get_schedule(self) -> Optional[pd.DataFrame]:
         """Get match schedule"""
         try:
-            return self.scraper.read_schedule()
+            return self._request(self.scraper.read_schedule)
         except Exception as e:
             logging.error(f"Error getting schedule from Sofascore: {e}")
             return None
@@ -43,4 +59,14 @@ class SofascoreScraper:
     
     def get_seasons(self) -> List[str]:
         """Get available seasons"""
-        return self.scraper.available_seasons(self.league) if self.league else []
\ No newline at end of file
+        return self.scraper.available_seasons(self.league) if self.league else []
+    
+    # ==================== ASYNC ====================
+    
+    async def aget_league_table(self) -> Optional[pd.DataFrame]:
+        """Async version of get_league_table"""
+        return await run_blocking("sofascore", self.get_league_table)
+    
+    async def aget_schedule(self) -> Optional[pd.DataFrame]:
+        """Async version of get_schedule"""
+        return await run_blocking("sofascore", self.get_schedule)
\ No newline at end of file
@@ -1,6 +1,9 @@
 import soccerdata as sd
 
-def get_data(league):
+from scrapers.request_scheduler import UNDERSTAT_HOST, PRIORITY_INTERACTIVE, get_scheduler
+
+
+def get_data(league, priority=PRIORITY_INTERACTIVE):
 
     us = sd.Understat(
         leagues=[league],
@@ -8,8 +11,11 @@ def get_data(league):
         no_cache=True
     )
 
-    schedule = us.read_schedule()
-    team_match_stats = us.read_team_match_stats()
+    # Las lecturas pasan por el planificador compartido (rate limit + reintentos)
+    scheduler = get_scheduler()
+
+    schedule = scheduler.call(UNDERSTAT_HOST, us.read_schedule, priority=priority)
+    team_match_stats = scheduler.call(UNDERSTAT_HOST, us.read_team_match_stats, priority=priority)
 
     return {
         "schedule": schedule,